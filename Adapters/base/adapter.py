@@ -11,6 +11,9 @@ from Core.message.dispatcher import message_async_dispatcher
 from .bot import BaseBot
 from .event import BaseEvent
 
+# 未声明支持类型时的默认值：仅文本
+_DEFAULT_MESSAGE_TYPES = frozenset({"text"})
+
 
 class BaseAdapter(ABC):
     """
@@ -23,6 +26,18 @@ class BaseAdapter(ABC):
     4. 维护连接状态（WebSocket/HTTP）
     """
 
+    # 消息类型 -> build_<type>_message 函数，子类创建时生成
+    _message_builders: Dict[str, Callable] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # 类创建时建立消息构建分发表，避免每次构建消息都拼接方法名再 getattr
+        cls._message_builders = {
+            name[len("build_"):-len("_message")]: getattr(cls, name)
+            for name in dir(cls)
+            if name.startswith("build_") and name.endswith("_message") and name != "build_message"
+        }
+
     def __init__(self, bot_id: int, config: Dict[str, Any]):
         """
         初始化适配器
@@ -177,11 +192,11 @@ class BaseAdapter(ABC):
     @classmethod
     def get_supported_message_types(cls) -> set[str]:
         """获取支持的消息类型集合"""
-        return set(cls.SUPPORTED_MESSAGE_TYPES or {"text"})
+        return set(cls.SUPPORTED_MESSAGE_TYPES or _DEFAULT_MESSAGE_TYPES)
 
     def supports_message_type(self, message_type: str) -> bool:
-        """当前协议是否支持某种消息类型"""
-        return message_type in self.get_supported_message_types()
+        """当前协议是否支持某种消息类型（直接查 frozenset，不复制集合）"""
+        return message_type in (self.SUPPORTED_MESSAGE_TYPES or _DEFAULT_MESSAGE_TYPES)
 
     @classmethod
     def get_webhook_path(cls) -> Optional[str]:
@@ -291,10 +306,10 @@ class BaseAdapter(ABC):
 
         子类实现 build_<type>_message 方法。
         """
-        builder = getattr(self, f"build_{message_type}_message", None)
-        if not builder:
+        builder = self._message_builders.get(message_type)
+        if builder is None:
             raise ValueError(f"协议 '{self.get_protocol_name()}' 未实现消息类型: {message_type}")
-        return builder(**kwargs)
+        return builder(self, **kwargs)
 
     @abstractmethod
     def get_protocol_name(self) -> str:
@@ -325,6 +340,6 @@ class BaseAdapter(ABC):
     WEBHOOK_PATH: Optional[str] = None
     WEBHOOK_HANDLER: Optional[str] = None  # "module.path.callable_name"
     STARTUP_ERROR_HINT: str = "适配器启动失败，请检查协议配置与网络连通性"
-    SUPPORTED_MESSAGE_TYPES: set[str] = {"text"}
+    SUPPORTED_MESSAGE_TYPES: frozenset[str] = _DEFAULT_MESSAGE_TYPES
     BOT_CONFIG_FIELDS: list[dict[str, Any]] = []
     UNIQUE_CONFIG_FIELDS: list[str] = []
@@ -22,6 +22,16 @@ class BaseEvent(ABC):
     # Bot对象引用（由适配器注入）
     bot: Optional["BaseBot"] = None
 
+    # 协议名与机器人ID缓存（由消息处理器在分发前写入，避免反复走 bot.adapter 属性链）
+    _cached_protocol: Optional[str] = None
+    _cached_bot_id: Optional[int] = None
+
+    # 事件大类（message/notice/request/meta），子类字段覆盖
+    post_type: str = "message"
+
+    # 是否为元事件（心跳、生命周期等），元事件不进入工作流处理
+    is_meta_event: bool = False
+
     @abstractmethod
     def get_type(self) -> str:
         """
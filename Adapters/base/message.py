@@ -80,6 +80,9 @@ class BaseMessage(list, Generic[TMS], ABC):
     提供链式构造、序列化等功能
     """
 
+    # 类型标记：热路径上用属性判断代替 isinstance 的 MRO 查找
+    __is_base_message__ = True
+
     def __init__(self, *segments: Union[TMS, str, ABCIterable[TMS]]):
         """
         初始化消息
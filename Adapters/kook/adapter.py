@@ -11,6 +11,7 @@ from Core.logging.file_logger import log_info, log_error, log_debug
 from .bot import KookBot
 from .config import KookConfig
 from .event import KookEvent, KookMessageEvent
+from .message import KookMessage
 from ..base.adapter import BaseAdapter
 from ..base.bot import BaseBot
 
@@ -23,7 +24,7 @@ class KookAdapter(BaseAdapter):
     WEBHOOK_PATH = "kook"
     WEBHOOK_HANDLER = "BluePrints.webhook.kook.handle_kook_webhook"
     STARTUP_ERROR_HINT = "KOOK适配器启动失败，请检查Bot Token与网络连通性"
-    SUPPORTED_MESSAGE_TYPES = {"text", "image", "video", "voice", "file"}
+    SUPPORTED_MESSAGE_TYPES = frozenset({"text", "image", "video", "voice", "file"})
     BOT_CONFIG_FIELDS = [
         {
             "name": "bot_token",
@@ -154,22 +155,17 @@ class KookAdapter(BaseAdapter):
         return f"bot_token={token_safe} verify_token={verify_safe}"
 
     def build_text_message(self, content: str):
-        from .message import KookMessage
         return KookMessage.text(content)
 
     def build_image_message(self, image_url_or_file_info: str = "", caption: str = "",
                             base64_data: str = None, auto_upload: bool = True):
-        from .message import KookMessage
         return KookMessage.image(image_url_or_file_info or (f"base64://{base64_data}" if base64_data else ""))
 
     def build_video_message(self, video_url: str, caption: str = ""):
-        from .message import KookMessage
         return KookMessage.video(video_url)
 
     def build_voice_message(self, voice_url: str):
-        from .message import KookMessage
         return KookMessage.voice(voice_url)
 
     def build_file_message(self, file_url: str, filename: str = ""):
-        from .message import KookMessage
         return KookMessage.file(file_url, filename)
@@ -19,6 +19,7 @@ from Core.message.dispatcher import message_async_dispatcher
 from .bot import OneBotBot
 from .config import OneBotConfig
 from .event import OneBotEvent, OneBotMessageEvent, OneBotNoticeEvent, OneBotRequestEvent, OneBotMetaEvent
+from .message import OneBotMessage
 from ...base.adapter import BaseAdapter
 from ...base.bot import BaseBot
 
@@ -29,7 +30,7 @@ class OneBotAdapter(BaseAdapter):
     PROTOCOL = "onebot"
     DISPLAY_NAME = "OneBot V11"
     STARTUP_ERROR_HINT = "OneBot适配器启动失败，请检查WebSocket配置"
-    SUPPORTED_MESSAGE_TYPES = {"text", "image", "video", "voice"}
+    SUPPORTED_MESSAGE_TYPES = frozenset({"text", "image", "video", "voice"})
     BOT_CONFIG_FIELDS = [
         {
             "name": "ws_host",
@@ -494,18 +495,14 @@ class OneBotAdapter(BaseAdapter):
         return f"ws://{ws_host}:{ws_port}"
 
     def build_text_message(self, content: str):
-        from .message import OneBotMessage
         return OneBotMessage.text(content)
 
     def build_image_message(self, image_url_or_file_info: str = "", caption: str = "",
                             base64_data: str = None, auto_upload: bool = True):
-        from .message import OneBotMessage
         return OneBotMessage.image(image_url_or_file_info or base64_data or "")
 
     def build_video_message(self, video_url: str, caption: str = ""):
-        from .message import OneBotMessage
         return OneBotMessage.video(video_url)
 
     def build_voice_message(self, voice_url: str):
-        from .message import OneBotMessage
         return OneBotMessage.record(voice_url)
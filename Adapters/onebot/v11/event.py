@@ -199,6 +199,8 @@ class OneBotRequestEvent(OneBotEvent):
 class OneBotMetaEvent(OneBotEvent):
     """元事件（心跳、生命周期等）"""
 
+    is_meta_event = True
+
     post_type: str = "meta_event"
     meta_event_type: str = ""
     sub_type: str = ""
@@ -4,12 +4,21 @@ QQ协议适配器
 基于QQ官方Webhook API
 """
 
+import json
 from typing import Dict, Any, Optional
 
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 from Core.logging.file_logger import log_info, log_error, log_debug
 from .bot import QQBot
 from .config import QQConfig
 from .event import QQMessageEvent, QQEvent
+from .message import QQMessage, QQMessageSegment
 from ..base.adapter import BaseAdapter
 from ..base.bot import BaseBot
 
@@ -161,12 +170,10 @@ class QQAdapter(BaseAdapter):
         return f"app_id={safe_app_id}"
 
     def build_text_message(self, content: str):
-        from .message import QQMessage
         return QQMessage.text(content)
 
     def build_image_message(self, image_url_or_file_info: str = "", caption: str = "",
                             base64_data: str = None, auto_upload: bool = True):
-        from .message import QQMessage, QQMessageSegment
         return QQMessage([QQMessageSegment.image(
             url=image_url_or_file_info,
             caption=caption,
@@ -174,20 +181,16 @@ class QQAdapter(BaseAdapter):
         )])
 
     def build_video_message(self, video_url: str, caption: str = ""):
-        from .message import QQMessage
         return QQMessage.video(video_url, caption)
 
     def build_voice_message(self, voice_url: str):
-        from .message import QQMessage
         return QQMessage.voice(voice_url)
 
     def build_file_message(self, file_url: str, filename: str = ""):
-        from .message import QQMessage
         return QQMessage.file(file_url, filename)
 
     def build_markdown_message(self, content: str, template_id: str = "", keyboard_id: str = "",
                                keyboard_content: str = ""):
-        from .message import QQMessage, QQMessageSegment
         if template_id:
             return QQMessage([QQMessageSegment.markdown_template(
                 template_id, content, keyboard_id, keyboard_content
@@ -195,25 +198,26 @@ class QQAdapter(BaseAdapter):
         return QQMessage([QQMessageSegment.markdown(content, keyboard_id, keyboard_content)])
 
     def build_keyboard_message(self, content: str, keyboard_id: str):
-        from .message import QQMessage, QQMessageSegment
         return QQMessage([QQMessageSegment.keyboard(content, keyboard_id)])
 
-    def build_ark_message(self, content: str, template_id: int = 24):
-        import json
-        from .message import QQMessage, QQMessageSegment
-        try:
-            kv = json.loads(content)
+    def build_ark_message(self, content: str | list, template_id: int = 24):
+        # 已解析的 kv 列表直接使用，跳过 JSON 解析
+        if isinstance(content, (list, tuple)):
+            kv = list(content)
+        else:
+            try:
+                kv = _json_loads(content)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"ARK内容JSON解析失败: {e}")
             if not isinstance(kv, list):
                 raise ValueError("ARK内容必须是JSON数组格式")
-        except json.JSONDecodeError as e:
-            raise ValueError(f"ARK内容JSON解析失败: {e}")
         return QQMessage([QQMessageSegment.ark(template_id, kv)])
     PROTOCOL = "qq"
     DISPLAY_NAME = "QQ"
     WEBHOOK_PATH = "qq"
     WEBHOOK_HANDLER = "BluePrints.webhook.qq.handle_qq_webhook"
     STARTUP_ERROR_HINT = "QQ API连接验证失败，请检查AppID/AppSecret和IP白名单设置"
-    SUPPORTED_MESSAGE_TYPES = {"text", "image", "video", "voice", "file", "markdown", "ark"}
+    SUPPORTED_MESSAGE_TYPES = frozenset({"text", "image", "video", "voice", "file", "markdown", "ark"})
     UNIQUE_CONFIG_FIELDS = ["app_id"]
     BOT_CONFIG_FIELDS = [
         {
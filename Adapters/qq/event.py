@@ -180,6 +180,8 @@ class QQNoticeEvent(QQEvent):
 class QQMetaEvent(QQEvent):
     """QQ元事件（待扩展）"""
 
+    is_meta_event = True
+
     post_type: str = "meta"
 
     def get_event_name(self) -> str:
@@ -268,6 +268,12 @@ def admin_edit_bot(bot_id):
             db.session.commit()
             db.session.refresh(bot)
 
+            # 所有者可能变更，清除消息处理器的所有者缓存
+            from Core.message.handler import invalidate_owner_cache
+            invalidate_owner_cache(bot_id)
+            from Core.scheduler.scheduler import scheduler_service
+            scheduler_service.invalidate_subscription_cache()
+
             # 配置保存后，立即刷新缓存，避免启动时读取到旧配置
             try:
                 from Core.bot.cache import bot_cache_manager
@@ -97,11 +97,11 @@ def globals_update(var_id):
             flash(f'变量 {key} 已存在', 'warning')
             return redirect(url_for('Admin.globals_list'))
 
-        # 如果 key 改变，需要删除旧的再创建新的
-        if key != var.key:
-            global_variables.delete(var.key)
-
-        global_variables.set(key, value, description, is_secret)
+        # 如果 key 改变，需要删除旧的再创建新的（同一次提交完成）
+        global_variables.set_many(
+            [(key, value, description, is_secret)],
+            delete_keys=[var.key] if key != var.key else None
+        )
 
         flash('更新成功', 'success')
 
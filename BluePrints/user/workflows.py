@@ -116,6 +116,13 @@ def toggle_workflow_subscription(workflow_id):
             message = f'工作流「{workflow.name}」已启用'
 
         db.session.commit()
+
+        # 订阅变更，清除消息工作流与调度器的订阅缓存
+        from Core.workflow.cache import workflow_cache
+        from Core.scheduler.scheduler import scheduler_service
+        workflow_cache.invalidate_subscriptions(user_id)
+        scheduler_service.invalidate_subscription_cache(workflow_id)
+
         flash(message, 'success')
         return redirect(url_for('user.workflows'))
 
@@ -5,13 +5,61 @@ QQ协议Webhook处理器
 
 import json
 from datetime import datetime
+from functools import lru_cache
 
-from Core.logging.file_logger import log_info, log_error, log_debug, log_warn
+try:
+    import nacl.signing
+
+    HAS_NACL = True
+except ImportError:
+    HAS_NACL = False
+
+from Core.logging.file_logger import log_info, log_error, log_debug, log_warn, log_debug_enabled
 from Database.Redis.client import set_value, get_value
 from Database.Redis.keys import qq_event_dedup_key, qq_message_raw_key
 from .events import QQEventProcessor
 from ..base import BaseWebhookHandler
 
+# 事件类型 -> 事件处理器方法名（模块级常量，只构建一次）
+# 仅接收 payload 的处理器
+_PAYLOAD_EVENT_HANDLERS = {
+    # 消息事件
+    'GROUP_MESSAGE_CREATE': 'handle_group_at_message',  # 群聊消息（非@）
+    'GROUP_AT_MESSAGE_CREATE': 'handle_group_at_message',  # 群聊@消息
+    'C2C_MESSAGE_CREATE': 'handle_c2c_message',  # 单聊消息
+    'MESSAGE_CREATE': 'handle_channel_message',  # 频道消息
+    'AT_MESSAGE_CREATE': 'handle_at_message',  # 公域频道@消息
+    'DIRECT_MESSAGE_CREATE': 'handle_direct_message',  # 私信消息
+    # 其他事件
+    'INTERACTION_CREATE': 'handle_interaction_event',  # 互动事件
+}
+
+_GUILD_EVENTS = frozenset({'GUILD_CREATE', 'GUILD_UPDATE', 'GUILD_DELETE'})
+_CHANNEL_EVENTS = frozenset({'CHANNEL_CREATE', 'CHANNEL_UPDATE', 'CHANNEL_DELETE'})
+_MEMBER_EVENTS = frozenset({'GUILD_MEMBER_ADD', 'GUILD_MEMBER_UPDATE', 'GUILD_MEMBER_REMOVE'})
+_FRIEND_EVENTS = frozenset({'FRIEND_ADD', 'FRIEND_DEL'})
+_GROUP_ROBOT_EVENTS = frozenset({'GROUP_ADD_ROBOT', 'GROUP_DEL_ROBOT'})
+_MSG_SETTING_EVENTS = frozenset({'C2C_MSG_REJECT', 'C2C_MSG_RECEIVE', 'GROUP_MSG_REJECT', 'GROUP_MSG_RECEIVE'})
+_AUDIT_EVENTS = frozenset({'MESSAGE_AUDIT_PASS', 'MESSAGE_AUDIT_REJECT'})
+
+# 同时接收 event_type 与 payload 的处理器
+_TYPED_EVENT_HANDLERS = {
+    **dict.fromkeys(_GUILD_EVENTS, 'handle_guild_event'),  # 频道管理事件
+    **dict.fromkeys(_CHANNEL_EVENTS, 'handle_channel_event'),
+    **dict.fromkeys(_MEMBER_EVENTS, 'handle_member_event'),  # 成员管理事件
+    **dict.fromkeys(_FRIEND_EVENTS, 'handle_friend_event'),  # 好友和群聊管理事件
+    **dict.fromkeys(_GROUP_ROBOT_EVENTS, 'handle_group_robot_event'),
+    **dict.fromkeys(_MSG_SETTING_EVENTS, 'handle_message_setting_event'),  # 消息推送开关事件
+    **dict.fromkeys(_AUDIT_EVENTS, 'handle_audit_event'),  # 消息审核事件
+}
+
+
+@lru_cache(maxsize=256)
+def _sign_hex(signing_key, event_ts: str, plain_token: str) -> str:
+    """对 event_ts + plain_token 签名并返回hex，QQ重试回调验证时直接命中缓存"""
+    message = (event_ts + plain_token).encode('utf-8')
+    return signing_key.sign(message).signature.hex()
+
 
 class QQWebhookHandler(BaseWebhookHandler):
     """QQ协议Webhook处理器"""
@@ -21,6 +69,17 @@ class QQWebhookHandler(BaseWebhookHandler):
     def __init__(self):
         super().__init__("QQ")
         self.event_processor = QQEventProcessor()  # 初始化事件处理器
+        self._signing_key_cache = {}  # AppID -> (secret, SigningKey)
+
+        # 预先绑定事件路由表，避免每个事件重建映射
+        self._payload_handlers = {
+            event_type: getattr(self.event_processor, name)
+            for event_type, name in _PAYLOAD_EVENT_HANDLERS.items()
+        }
+        self._typed_handlers = {
+            event_type: getattr(self.event_processor, name)
+            for event_type, name in _TYPED_EVENT_HANDLERS.items()
+        }
 
     def validate_request(self, raw_data: bytes, headers: dict) -> tuple[bool, str]:
         """验证QQ Webhook请求"""
@@ -141,7 +200,6 @@ class QQWebhookHandler(BaseWebhookHandler):
         try:
             # 检查是否是验证请求
             try:
-                import json
                 event_data = json.loads(raw_data.decode('utf-8'))
                 op_code = event_data.get('op')
 
@@ -159,7 +217,8 @@ class QQWebhookHandler(BaseWebhookHandler):
                 return False
 
             # 使用PyNaCl进行Ed25519签名验证
-            result = self._verify_ed25519_simple(raw_data, signature, timestamp, secret)
+            result = self._verify_ed25519_simple(raw_data, signature, timestamp, secret,
+                                                 headers.get('X-Bot-Appid'))
 
             if not result:
                 log_error(0, "QQ签名验证失败", "QQ_WEBHOOK_SIGNATURE_FAILED")
@@ -170,49 +229,81 @@ class QQWebhookHandler(BaseWebhookHandler):
             log_error(0, f"QQ签名验证异常: {e}", "QQ_WEBHOOK_SIGNATURE_ERROR")
             return False
 
-    def _verify_ed25519_simple(self, raw_data: bytes, signature: str, timestamp: str, secret: str) -> bool:
-        """Ed25519签名验证"""
-        try:
-            import nacl.signing
-            import nacl.encoding
+    @staticmethod
+    def _derive_seed(secret: str) -> bytes | None:
+        """将secret重复拼接到32个字符作为Ed25519 seed"""
+        if not secret:
+            return None
+        return (secret * (32 // len(secret) + 1))[:32].encode('utf-8')
 
-            # 1. 生成seed
-            seed = secret
-            while len(seed) < 32:
-                seed += seed
-            seed = seed[:32].encode('utf-8')
+    def _get_signing_key(self, app_id: str, secret: str):
+        """获取AppID对应的SigningKey，secret未变化时复用缓存"""
+        cache_key = app_id or secret
+        cached = self._signing_key_cache.get(cache_key)
+        if cached and cached[0] == secret:
+            return cached[1]
+
+        seed = self._derive_seed(secret)
+        if seed is None:
+            return None
+
+        signing_key = nacl.signing.SigningKey(seed)
+        self._signing_key_cache[cache_key] = (secret, signing_key)
+        return signing_key
+
+    def _load_app_secret(self, app_id: str) -> str | None:
+        """从数据库查找AppID对应的secret"""
+        from app import app as flask_app
+        with flask_app.app_context():
+            from Models import Bot
+            # 查询QQ协议的机器人
+            bots = Bot.query.filter_by(protocol='qq').all()
+            for bot in bots:
+                bot_config = bot.get_config()
+                if bot_config.get('app_id') == app_id:
+                    return bot_config.get('app_secret')
+        return None
+
+    def _verify_ed25519_simple(self, raw_data: bytes, signature: str, timestamp: str, secret: str,
+                               app_id: str = None) -> bool:
+        """Ed25519签名验证"""
+        if not HAS_NACL:
+            log_error(0, "缺少PyNaCl库", "QQ_WEBHOOK_MISSING_NACL")
+            return False
 
-            # 2. 生成验证密钥
-            verify_key = nacl.signing.SigningKey(seed).verify_key
+        try:
+            # 1. 获取验证密钥（按AppID缓存）
+            signing_key = self._get_signing_key(app_id, secret)
+            if signing_key is None:
+                return False
+            verify_key = signing_key.verify_key
 
-            # 3. 解码签名
+            # 2. 解码签名
             try:
                 signature_bytes = bytes.fromhex(signature)
             except Exception:
                 return False
 
-            # 4. 构建验证消息：timestamp + body
+            # 3. 构建验证消息：timestamp + body
             verify_message = (timestamp + raw_data.decode('utf-8')).encode('utf-8')
 
-            # 5. 验证签名
+            # 4. 验证签名
             try:
                 verify_key.verify(verify_message, signature_bytes)
                 return True
             except Exception:
                 return False
 
-        except ImportError:
-            log_error(0, "缺少PyNaCl库", "QQ_WEBHOOK_MISSING_NACL")
-            return False
         except Exception:
             return False
 
     def generate_verification_signature(self, event_ts: str, plain_token: str) -> str:
         """生成回调验证的signature"""
-        try:
-            import nacl.signing
+        if not HAS_NACL:
+            log_error(0, "缺少PyNaCl库", "QQ_WEBHOOK_MISSING_NACL")
+            return None
 
-            # 获取机器人的secret
+        try:
             from flask import request
             app_id = request.headers.get('X-Bot-Appid')
 
@@ -220,39 +311,26 @@ class QQWebhookHandler(BaseWebhookHandler):
                 log_error(0, "无法获取AppID", "QQ_WEBHOOK_VERIFICATION_NO_APPID")
                 return None
 
-            # 从数据库获取机器人配置
-            try:
-                from app import app as flask_app
-                with flask_app.app_context():
-                    from Models import Bot
-                    # 查询QQ协议的机器人
-                    bots = Bot.query.filter_by(protocol='qq').all()
-                    secret = None
-                    for bot in bots:
-                        bot_config = bot.get_config()
-                        if bot_config.get('app_id') == app_id:
-                            secret = bot_config.get('app_secret')
-                            break
-
-                    if not secret:
-                        log_error(0, f"未找到机器人: {app_id}", "QQ_WEBHOOK_BOT_NOT_FOUND")
-                        return None
-            except Exception as e:
-                log_error(0, "数据库查询失败", "QQ_WEBHOOK_DB_ERROR")
-                return None
+            # 优先复用签名验证阶段缓存的SigningKey
+            cached = self._signing_key_cache.get(app_id)
+            if cached:
+                signing_key = cached[1]
+            else:
+                # 缓存未命中，从数据库获取机器人的secret
+                try:
+                    secret = self._load_app_secret(app_id)
+                except Exception:
+                    log_error(0, "数据库查询失败", "QQ_WEBHOOK_DB_ERROR")
+                    return None
 
-            # 生成seed
-            seed = secret
-            while len(seed) < 32:
-                seed += seed
-            seed = seed[:32].encode('utf-8')
+                if not secret:
+                    log_error(0, f"未找到机器人: {app_id}", "QQ_WEBHOOK_BOT_NOT_FOUND")
+                    return None
 
-            # 生成签名
-            signing_key = nacl.signing.SigningKey(seed)
-            message = (event_ts + plain_token).encode('utf-8')
-            signature_bytes = signing_key.sign(message).signature
+                signing_key = self._get_signing_key(app_id, secret)
 
-            return signature_bytes.hex()
+            # 生成签名（SigningKey可哈希，secret变化后自然不会命中旧缓存）
+            return _sign_hex(signing_key, event_ts, plain_token)
 
         except Exception as e:
             log_error(0, f"生成signature失败: {e}", "QQ_WEBHOOK_VERIFICATION_SIGNATURE_ERROR")
@@ -365,8 +443,9 @@ class QQWebhookHandler(BaseWebhookHandler):
             # 立即记录事件ID
             if unique_event_id:
                 self._record_event(unique_event_id)
-                log_debug(bot_id, f"事件ID已记录: {unique_event_id}", "QQ_EVENT_RECORDED_EARLY",
-                          event_id=unique_event_id)
+                if log_debug_enabled():
+                    log_debug(bot_id, f"事件ID已记录: {unique_event_id}", "QQ_EVENT_RECORDED_EARLY",
+                              event_id=unique_event_id)
 
             # 提取时间戳信息
             timestamp = event_payload.get('timestamp') if event_payload else None
@@ -378,10 +457,12 @@ class QQWebhookHandler(BaseWebhookHandler):
                      event_id=unique_event_id,
                      payload_keys=list(event_payload.keys()) if event_payload else [])
 
-            log_debug(bot_id, f"事件详细信息", "QQ_EVENT_DEBUG",
-                      qq_event_type=event_type, op_code=op_code,
-                      payload_size=len(str(event_payload)) if event_payload else 0,
-                      has_bot_manager=bot_manager is not None)
+            if log_debug_enabled():
+                # 直接复用已序列化的 webhook body 长度，避免对整个事件再做一次 str()
+                log_debug(bot_id, f"事件详细信息", "QQ_EVENT_DEBUG",
+                          qq_event_type=event_type, op_code=op_code,
+                          payload_size=len(webhook_body_json) if event_payload else 0,
+                          has_bot_manager=bot_manager is not None)
 
             # 处理回调地址验证（这个逻辑已经在基类中优先处理了，这里不应该再执行到）
             if op_code == 13:  # 回调地址验证
@@ -389,55 +470,19 @@ class QQWebhookHandler(BaseWebhookHandler):
                 return self.event_processor.handle_callback_verification(bot_id, event_payload)
 
             # 路由事件到事件处理器并处理结果（使用映射表避免 if/elif 漏判）
-            payload_handlers = {
-                # 消息事件
-                'GROUP_MESSAGE_CREATE': self.event_processor.handle_group_at_message,  # 群聊消息（非@）
-                'GROUP_AT_MESSAGE_CREATE': self.event_processor.handle_group_at_message,  # 群聊@消息
-                'C2C_MESSAGE_CREATE': self.event_processor.handle_c2c_message,  # 单聊消息
-                'MESSAGE_CREATE': self.event_processor.handle_channel_message,  # 频道消息
-                'AT_MESSAGE_CREATE': self.event_processor.handle_at_message,  # 公域频道@消息
-                'DIRECT_MESSAGE_CREATE': self.event_processor.handle_direct_message,  # 私信消息
-                # 其他事件
-                'INTERACTION_CREATE': self.event_processor.handle_interaction_event,  # 互动事件
-            }
-            typed_handlers = {
-                # 频道管理事件
-                'GUILD_CREATE': self.event_processor.handle_guild_event,
-                'GUILD_UPDATE': self.event_processor.handle_guild_event,
-                'GUILD_DELETE': self.event_processor.handle_guild_event,
-                'CHANNEL_CREATE': self.event_processor.handle_channel_event,
-                'CHANNEL_UPDATE': self.event_processor.handle_channel_event,
-                'CHANNEL_DELETE': self.event_processor.handle_channel_event,
-                # 成员管理事件
-                'GUILD_MEMBER_ADD': self.event_processor.handle_member_event,
-                'GUILD_MEMBER_UPDATE': self.event_processor.handle_member_event,
-                'GUILD_MEMBER_REMOVE': self.event_processor.handle_member_event,
-                # 好友和群聊管理事件
-                'FRIEND_ADD': self.event_processor.handle_friend_event,
-                'FRIEND_DEL': self.event_processor.handle_friend_event,
-                'GROUP_ADD_ROBOT': self.event_processor.handle_group_robot_event,
-                'GROUP_DEL_ROBOT': self.event_processor.handle_group_robot_event,
-                # 消息推送开关事件
-                'C2C_MSG_REJECT': self.event_processor.handle_message_setting_event,
-                'C2C_MSG_RECEIVE': self.event_processor.handle_message_setting_event,
-                'GROUP_MSG_REJECT': self.event_processor.handle_message_setting_event,
-                'GROUP_MSG_RECEIVE': self.event_processor.handle_message_setting_event,
-                # 消息审核事件
-                'MESSAGE_AUDIT_PASS': self.event_processor.handle_audit_event,
-                'MESSAGE_AUDIT_REJECT': self.event_processor.handle_audit_event,
-            }
-
-            if event_type in payload_handlers:
-                result = payload_handlers[event_type](bot_id, event_payload, bot_manager)
-            elif event_type in typed_handlers:
-                result = typed_handlers[event_type](bot_id, event_type, event_payload, bot_manager)
+            payload_handler = self._payload_handlers.get(event_type)
+            if payload_handler is not None:
+                result = payload_handler(bot_id, event_payload, bot_manager)
+            elif event_type in self._typed_handlers:
+                result = self._typed_handlers[event_type](bot_id, event_type, event_payload, bot_manager)
             else:
                 log_info(bot_id, f"未处理的QQ事件类型: {event_type}", "QQ_WEBHOOK_UNHANDLED_EVENT")
                 result = {"status": "ignored", "message": f"Unhandled event type: {event_type}"}
 
             # 移除原有的延迟记录逻辑，因为已经在前面立即记录了
-            log_debug(bot_id, f"事件处理完成: {event_type}", "QQ_EVENT_PROCESSED",
-                      event_id=unique_event_id, result_status=result.get("status") if result else "none")
+            if log_debug_enabled():
+                log_debug(bot_id, f"事件处理完成: {event_type}", "QQ_EVENT_PROCESSED",
+                          event_id=unique_event_id, result_status=result.get("status") if result else "none")
 
             return result
 
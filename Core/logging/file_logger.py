@@ -6,9 +6,11 @@
 import os
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from enum import Enum
 from queue import Queue
+from typing import Callable
 
 # 北京时区 (UTC+8)
 BEIJING_TZ = timezone(timedelta(hours=8))
@@ -26,12 +28,32 @@ class LogLevel(Enum):
     ERROR = "ERROR"
 
 
+# 级别优先级，用于快速过滤
+LEVEL_RANK = {
+    LogLevel.DEBUG: 10,
+    LogLevel.INFO: 20,
+    LogLevel.WARN: 30,
+    LogLevel.ERROR: 40,
+}
+
+
+def _default_log_level() -> LogLevel:
+    """从环境变量读取最低日志级别，未配置时调试模式记录DEBUG，否则从INFO起记录"""
+    level_name = os.getenv('LOG_LEVEL', '').upper()
+    if level_name in LogLevel.__members__:
+        return LogLevel[level_name]
+    return LogLevel.DEBUG if os.getenv('DEBUG', 'false').lower() == 'true' else LogLevel.INFO
+
+
 class BotFileLogger:
     """机器人文件日志系统"""
 
-    def __init__(self, log_dir="logs"):
+    def __init__(self, log_dir="logs", min_level: LogLevel = None):
         self.log_dir = log_dir
-        self.log_queue = Queue(maxsize=1000)
+        self.min_level = min_level or _default_log_level()
+        self._min_rank = LEVEL_RANK[self.min_level]
+        # 不限长度：调用方只做入队，不会因队列满而在调用线程（如调度器工作线程）同步写盘
+        self.log_queue = Queue()
         self.running = False
         self.worker_thread = None
         self.lock = threading.Lock()
@@ -40,6 +62,8 @@ class BotFileLogger:
         self.batch_size = 100  # 增加批量大小
         self.batch_timeout = 0.5  # 减少超时
         self.file_handles = {}  # 文件句柄缓存
+        # 多文件并行写入，不同机器人的磁盘IO可以重叠
+        self._io_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="file_logger_io")
 
         # 性能优化
         self.format_cache = {}  # 格式化缓存
@@ -64,10 +88,31 @@ class BotFileLogger:
         self.running = False
         if self.worker_thread:
             self.worker_thread.join(timeout=3)
+        self._io_pool.shutdown(wait=True)
+
+    def set_min_level(self, level: LogLevel):
+        """设置最低记录级别"""
+        self.min_level = level
+        self._min_rank = LEVEL_RANK[level]
 
-    def log(self, bot_id: int, level: LogLevel, message: str,
+    def is_enabled_for(self, level: LogLevel) -> bool:
+        """指定级别是否会被记录"""
+        return self._min_rank <= LEVEL_RANK[level]
+
+    def is_debug_enabled(self) -> bool:
+        """DEBUG级别是否会被记录"""
+        return self.is_enabled_for(LogLevel.DEBUG)
+
+    def log(self, bot_id: int, level: LogLevel, message: str | Callable[[], str],
             event_type: str = "", **metadata):
-        """记录日志"""
+        """记录日志，message 可传入无参函数，仅在级别启用时才生成消息文本"""
+        # 低于最低级别的日志直接丢弃，不进入队列
+        if LEVEL_RANK[level] < self._min_rank:
+            return
+
+        if callable(message):
+            message = message()
+
         # 检查后台线程状态
         if not self.running or not self.worker_thread or not self.worker_thread.is_alive():
             self.start_worker()
@@ -82,11 +127,7 @@ class BotFileLogger:
             'metadata': metadata
         }
 
-        try:
-            self.log_queue.put_nowait(log_entry)
-        except Exception:
-            # 队列满时，直接写入（阻塞模式）
-            self._write_log_entry(log_entry)
+        self.log_queue.put_nowait(log_entry)
 
     def _process_logs(self):
         """后台处理日志队列"""
@@ -135,18 +176,27 @@ class BotFileLogger:
                 file_groups[file_path] = []
             file_groups[file_path].append(log_entry)
 
-        # 批量写入每个文件
-        for file_path, entries in file_groups.items():
-            self._write_entries_to_file(file_path, entries)
+        # 批量写入每个文件：单文件直接写，多文件交给IO线程池并行写
+        if len(file_groups) == 1:
+            for file_path, entries in file_groups.items():
+                self._write_entries_to_file(file_path, entries)
+            return
+
+        try:
+            list(self._io_pool.map(lambda item: self._write_entries_to_file(*item), file_groups.items()))
+        except RuntimeError:
+            # 线程池已关闭（退出阶段），回退到串行写入
+            for file_path, entries in file_groups.items():
+                self._write_entries_to_file(file_path, entries)
 
     def _build_log_file_path(self, bot_id, timestamp):
         """构建日志文件路径"""
+        # 日期格式固定，直接拼接属性比 strftime 更快
+        filename = f"{timestamp.year:04d}-{timestamp.month:02d}-{timestamp.day:02d}.log"
         if bot_id == 0:  # 系统日志
             log_dir = os.path.join(self.log_dir, "system")
-            filename = f"{timestamp.strftime('%Y-%m-%d')}.log"
         else:  # 机器人日志
             log_dir = os.path.join(self.log_dir, f"bot_{bot_id}")
-            filename = f"{timestamp.strftime('%Y-%m-%d')}.log"
 
         return os.path.join(log_dir, filename)
 
@@ -174,7 +224,8 @@ class BotFileLogger:
 
     def _format_log_line(self, log_entry: dict):
         """格式化日志行"""
-        timestamp_str = log_entry['timestamp'].strftime("%H:%M:%S")
+        ts = log_entry['timestamp']
+        timestamp_str = f"{ts.hour:02d}:{ts.minute:02d}:{ts.second:02d}"
         level = log_entry['level']
         event_type = log_entry['event_type']
         message = log_entry['message']
@@ -414,25 +465,35 @@ def get_file_logger() -> BotFileLogger:
 
 
 # 便捷函数
-def log_info(bot_id: int, message: str, event_type: str = "INFO", **metadata):
+def log_debug_enabled() -> bool:
+    """DEBUG级别是否启用，用于在构造昂贵的调试元数据前快速判断"""
+    return get_file_logger().is_debug_enabled()
+
+
+def log_info_enabled() -> bool:
+    """INFO级别是否启用，用于在格式化日志消息前快速判断"""
+    return get_file_logger().is_enabled_for(LogLevel.INFO)
+
+
+def log_info(bot_id: int, message: str | Callable[[], str], event_type: str = "INFO", **metadata):
     """记录信息日志"""
     logger = get_file_logger()
     logger.log(bot_id, LogLevel.INFO, message, event_type, **metadata)
 
 
-def log_error(bot_id: int, message: str, event_type: str = "ERROR", **metadata):
+def log_error(bot_id: int, message: str | Callable[[], str], event_type: str = "ERROR", **metadata):
     """记录错误日志"""
     logger = get_file_logger()
     logger.log(bot_id, LogLevel.ERROR, message, event_type, **metadata)
 
 
-def log_warn(bot_id: int, message: str, event_type: str = "WARN", **metadata):
+def log_warn(bot_id: int, message: str | Callable[[], str], event_type: str = "WARN", **metadata):
     """记录警告日志"""
     logger = get_file_logger()
     logger.log(bot_id, LogLevel.WARN, message, event_type, **metadata)
 
 
-def log_debug(bot_id: int, message: str, event_type: str = "DEBUG", **metadata):
+def log_debug(bot_id: int, message: str | Callable[[], str], event_type: str = "DEBUG", **metadata):
     """记录调试日志"""
     logger = get_file_logger()
     logger.log(bot_id, LogLevel.DEBUG, message, event_type, **metadata)
@@ -40,12 +40,16 @@
     link_card = MessageBuilder.link_card("文章标题", "文章描述", "https://example.com")
 """
 
-from typing import TYPE_CHECKING
+from contextvars import ContextVar, Token
+from typing import TYPE_CHECKING, Optional
 
 if TYPE_CHECKING:
     from Adapters.base import BaseEvent
     from Adapters.base.message import BaseMessage
 
+# 当前事件（每个 asyncio 任务各自持有一份，避免并发消息互相覆盖）
+_current_event_var: ContextVar[Optional['BaseEvent']] = ContextVar('builder_current_event', default=None)
+
 
 class MessageBuilder:
     """
@@ -55,18 +59,23 @@ class MessageBuilder:
     必须在事件上下文中调用
     """
 
-    # 线程局部变量，存储当前 event
-    _current_event = None
+    @classmethod
+    def set_current_event(cls, event: 'BaseEvent') -> Token:
+        """设置当前事件（由框架调用），返回用于恢复的 token"""
+        return _current_event_var.set(event)
 
     @classmethod
-    def set_current_event(cls, event: 'BaseEvent'):
-        """设置当前事件（由框架调用）"""
-        cls._current_event = event
+    def clear_current_event(cls, token: Token = None):
+        """清除当前事件，传入 token 时恢复到设置前的值"""
+        if token is not None:
+            _current_event_var.reset(token)
+        else:
+            _current_event_var.set(None)
 
     @classmethod
-    def clear_current_event(cls):
-        """清除当前事件"""
-        cls._current_event = None
+    def get_current_event(cls) -> Optional['BaseEvent']:
+        """获取当前事件"""
+        return _current_event_var.get()
 
     @classmethod
     def text(cls, content: str, event: 'BaseEvent' = None) -> 'BaseMessage':
@@ -75,12 +84,12 @@ class MessageBuilder:
 
         Args:
             content: 文本内容
-            event: 事件对象（可选，会自动从线程局部获取）
+            event: 事件对象（可选，会自动从当前上下文获取）
 
         Returns:
             协议特定的 Message 对象
         """
-        event = event or cls._current_event
+        event = event or _current_event_var.get()
 
         if not event or not hasattr(event, 'bot'):
             raise RuntimeError("必须在事件上下文中调用 MessageBuilder")
@@ -104,7 +113,7 @@ class MessageBuilder:
         Returns:
             协议特定的 Message 对象
         """
-        event = event or cls._current_event
+        event = event or _current_event_var.get()
 
         if not event or not hasattr(event, 'bot'):
             raise RuntimeError("必须在事件上下文中调用 MessageBuilder")
@@ -131,7 +140,7 @@ class MessageBuilder:
         Returns:
             协议特定的 Message 对象
         """
-        event = event or cls._current_event
+        event = event or _current_event_var.get()
 
         if not event or not hasattr(event, 'bot'):
             raise RuntimeError("必须在事件上下文中调用 MessageBuilder")
@@ -151,7 +160,7 @@ class MessageBuilder:
         Returns:
             协议特定的 Message 对象
         """
-        event = event or cls._current_event
+        event = event or _current_event_var.get()
 
         if not event or not hasattr(event, 'bot'):
             raise RuntimeError("必须在事件上下文中调用 MessageBuilder")
@@ -172,7 +181,7 @@ class MessageBuilder:
         Returns:
             协议特定的 Message 对象
         """
-        event = event or cls._current_event
+        event = event or _current_event_var.get()
 
         if not event or not hasattr(event, 'bot'):
             raise RuntimeError("必须在事件上下文中调用 MessageBuilder")
@@ -207,7 +216,7 @@ class MessageBuilder:
         Raises:
             ValueError: 如果当前协议不支持 Markdown
         """
-        event = event or cls._current_event
+        event = event or _current_event_var.get()
 
         if not event or not hasattr(event, 'bot'):
             raise RuntimeError("必须在事件上下文中调用 MessageBuilder")
@@ -240,7 +249,7 @@ class MessageBuilder:
         Raises:
             ValueError: 如果当前协议不支持按钮
         """
-        event = event or cls._current_event
+        event = event or _current_event_var.get()
 
         if not event or not hasattr(event, 'bot'):
             raise RuntimeError("必须在事件上下文中调用 MessageBuilder")
@@ -253,12 +262,12 @@ class MessageBuilder:
             raise ValueError(f"协议 '{protocol}' 不支持按钮消息")
 
     @classmethod
-    def ark(cls, content: str, template_id: int = 24, event: 'BaseEvent' = None) -> 'BaseMessage':
+    def ark(cls, content: str | list, template_id: int = 24, event: 'BaseEvent' = None) -> 'BaseMessage':
         """
         构建 ARK 卡片消息
         
         Args:
-            content: JSON格式的kv参数，如 [{"key": "#TITLE#", "value": "标题"}]
+            content: JSON格式的kv参数，如 [{"key": "#TITLE#", "value": "标题"}]，也可直接传入已解析的列表
             template_id: ARK模板ID（如 23, 24, 37）
             event: 事件对象（可选）
 
@@ -268,7 +277,7 @@ class MessageBuilder:
         Raises:
             ValueError: 如果当前协议不支持 ARK
         """
-        event = event or cls._current_event
+        event = event or _current_event_var.get()
 
         if not event or not hasattr(event, 'bot'):
             raise RuntimeError("必须在事件上下文中调用 MessageBuilder")
@@ -2,8 +2,59 @@
 消息处理器
 """
 import asyncio
+import time
+import traceback
 
+from Core.logging.file_logger import log_error, log_info, log_debug, log_info_enabled
+from Core.message.builder import MessageBuilder
 from Core.utils.context import app_context
+from Core.workflow.cache import workflow_cache
+
+# 事件日志类型
+_NOTICE_EVENT_KEY = "NOTICE_EVENT_RECEIVED"
+_REQUEST_EVENT_KEY = "REQUEST_EVENT_RECEIVED"
+_MESSAGE_EVENT_KEY = "MESSAGE_RECEIVED"
+
+# 预先绑定工作流缓存的查询方法，每个事件都会调用
+_get_workflows_by_trigger = workflow_cache.get_workflows_by_trigger
+_prefilter_message_workflows = workflow_cache.prefilter_message_workflows
+
+# bot_id -> (owner_id, 写入时间)，机器人所有者极少变化，短期缓存避免每条消息查库
+_OWNER_CACHE_TTL = 60
+_owner_cache: dict[int, tuple[int | None, float]] = {}
+
+
+def _get_owner_id(bot_id: int) -> int | None:
+    """获取机器人所有者ID（带TTL缓存），仅在缓存未命中查库时进入 app_context"""
+    cached = _owner_cache.get(bot_id)
+    now = time.monotonic()
+    if cached and now - cached[1] < _OWNER_CACHE_TTL:
+        return cached[0]
+
+    from Models import Bot as BotModel
+    with app_context():
+        bot_db = BotModel.query.get(bot_id)
+    owner_id = bot_db.owner_id if bot_db else None
+    _owner_cache[bot_id] = (owner_id, now)
+    return owner_id
+
+
+def _format_msg_summary(event, content: str) -> str:
+    """构建消息摘要（仅在INFO日志启用时调用）"""
+    group_id = getattr(event, 'group_id', None)
+    user_id = getattr(event, 'user_id', None)
+    msg_summary = f"群{group_id}" if group_id else "私聊"
+    msg_summary += f" 用户{user_id}" if user_id else ""
+    msg_summary += f": \"{content[:20]}{'...' if len(content) > 20 else ''}\""
+    return msg_summary
+
+
+def invalidate_owner_cache(bot_id: int = None):
+    """机器人所有者变更后清除缓存，不传 bot_id 时清空全部"""
+    if bot_id is None:
+        _owner_cache.clear()
+    else:
+        _owner_cache.pop(bot_id, None)
 
 
 class MessageHandler:
@@ -17,136 +68,147 @@ class MessageHandler:
             event: BaseEvent对象
             bot_id: 机器人 id
         """
+        event_token = None
         try:
-            from Core.logging.file_logger import log_error, log_info, log_debug
-            from Core.message.builder import MessageBuilder
-            
             # 跳过元事件（心跳、生命周期等），这些不需要工作流处理
             # 保留 Notice、Request、Message 事件
-            event_type = type(event).__name__
-            if 'Meta' in event_type:
+            if getattr(event, 'is_meta_event', False):
                 return
 
             # 设置当前 event
-            MessageBuilder.set_current_event(event)
-
-            # 从event中获取信息
-            if not bot_id and hasattr(event, 'bot'):
-                bot_id = event.bot.adapter.bot_id
-
-            # 从缓存获取匹配的工作流
-            from Core.workflow.cache import workflow_cache
-            from Models import Bot as BotModel
-
-            # 获取协议类型
-            protocol = event.bot.adapter.get_protocol_name() if hasattr(event, 'bot') else None
-
-            # 单次消息复用 app_context：避免每个工作流重复入栈/出栈
-            with app_context():
-                # 获取 bot 所有者的用户ID
-                owner_id = None
-                if hasattr(event, 'bot') and event.bot:
-                    try:
-                        db_bot_id = event.bot.adapter.bot_id
-                        bot_db = BotModel.query.get(db_bot_id)
-                        if bot_db:
-                            owner_id = bot_db.owner_id
-                    except Exception as e:
-                        log_debug(0, f"获取 owner_id 失败: {e}", "GET_OWNER_ID_ERROR")
-
-                # 根据事件类型获取工作流
-                post_type = getattr(event, 'post_type', 'message')
-
-                if post_type == 'notice':
-                    # 通知事件（群成员增减、管理员变动等）
-                    notice_type = getattr(event, 'notice_type', '')
-                    log_info(0, f"通知事件: {notice_type}", "NOTICE_EVENT_RECEIVED",
+            event_token = MessageBuilder.set_current_event(event)
+
+            # 从event中获取信息，并缓存到 event 上供后续节点复用
+            protocol = None
+            adapter_bot_id = None
+            if getattr(event, 'bot', None):
+                adapter = event.bot.adapter
+                protocol = event._cached_protocol = adapter.get_protocol_name()
+                adapter_bot_id = event._cached_bot_id = adapter.bot_id
+                if not bot_id:
+                    bot_id = adapter_bot_id
+
+            # 获取 bot 所有者的用户ID
+            owner_id = None
+            if adapter_bot_id is not None:
+                try:
+                    owner_id = _get_owner_id(adapter_bot_id)
+                except Exception as e:
+                    log_debug(0, f"获取 owner_id 失败: {e}", "GET_OWNER_ID_ERROR")
+
+            # 根据事件类型获取工作流
+            post_type = event.post_type
+
+            if post_type == 'notice':
+                # 通知事件（群成员增减、管理员变动等）
+                notice_type = getattr(event, 'notice_type', '')
+                if log_info_enabled():
+                    log_info(0, f"通知事件: {notice_type}", _NOTICE_EVENT_KEY,
                              notice_type=notice_type,
                              group_id=getattr(event, 'group_id', None),
                              user_id=getattr(event, 'user_id', None))
-                    workflows = workflow_cache.get_workflows_by_trigger('notice', protocol, owner_id, notice_type)
+                workflows = _get_workflows_by_trigger('notice', protocol, owner_id, notice_type)
 
-                elif post_type == 'request':
-                    # 请求事件（好友申请、入群申请等）
-                    request_type = getattr(event, 'request_type', '')
-                    log_info(0, f"请求事件: {request_type}", "REQUEST_EVENT_RECEIVED",
+            elif post_type == 'request':
+                # 请求事件（好友申请、入群申请等）
+                request_type = getattr(event, 'request_type', '')
+                if log_info_enabled():
+                    log_info(0, f"请求事件: {request_type}", _REQUEST_EVENT_KEY,
                              request_type=request_type,
                              user_id=getattr(event, 'user_id', None),
                              comment=getattr(event, 'comment', ''))
-                    workflows = workflow_cache.get_workflows_by_trigger('request', protocol, owner_id, request_type)
+                workflows = _get_workflows_by_trigger('request', protocol, owner_id, request_type)
 
-                else:
-                    # 消息事件
-                    content = event.get_plaintext().strip()
+            else:
+                # 消息事件
+                content = event.get_plaintext().strip()
 
-                    # 记录消息摘要
-                    group_id = getattr(event, 'group_id', None)
-                    user_id = getattr(event, 'user_id', None)
-                    msg_summary = f"群{group_id}" if group_id else "私聊"
-                    msg_summary += f" 用户{user_id}" if user_id else ""
-                    msg_summary += f": \"{content[:20]}{'...' if len(content) > 20 else ''}\""
-                    log_info(0, msg_summary, "MESSAGE_RECEIVED")
+                # 记录消息摘要
+                log_info(0, lambda: _format_msg_summary(event, content), _MESSAGE_EVENT_KEY)
 
-                    workflows = workflow_cache.get_workflows_by_trigger('message', protocol, owner_id)
-                    workflows = workflow_cache.prefilter_message_workflows(workflows, content)
+                workflows = _get_workflows_by_trigger('message', protocol, owner_id)
+                workflows = _prefilter_message_workflows(workflows, content)
 
-                # 如果没有匹配的工作流，静默返回（不记录日志）
-                if not workflows:
+            # 常见情况：没有匹配的工作流，静默返回（不记录日志）
+            if not workflows:
+                return
+
+            # 确有工作流要执行时才进入 app_context，单次消息内复用，避免每个工作流重复入栈/出栈
+            with app_context():
+                # 常见情况：只匹配到一个工作流，直接执行，无需任务调度与完成队列
+                if len(workflows) == 1:
+                    workflow_data = workflows[0]
+                    try:
+                        result = await self._async_execute_workflow(workflow_data, event)
+                        await self._handle_workflow_result(event, result)
+                    except Exception as e:
+                        workflow_name = workflow_data['name']
+                        log_error(bot_id, f"工作流 {workflow_name} 执行异常: {e}",
+                                  "WORKFLOW_EXECUTION_ERROR", error=str(e), workflow=workflow_name)
                     return
 
                 # 全并发执行：谁先完成且命中就先响应，不阻塞后续优先级
-                task_to_workflow = {
-                    asyncio.create_task(self._async_execute_workflow(workflow_data, event)): workflow_data
-                    for workflow_data in workflows
-                }
-                pending = set(task_to_workflow.keys())
-
-                while pending:
-                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # 任务完成时回调入队，按完成顺序逐个取出，避免每轮 asyncio.wait 重建等待集合
+                loop = asyncio.get_running_loop()
+                done_queue = asyncio.Queue()
+                task_to_workflow = {}
+                for workflow_data in workflows:
+                    task = loop.create_task(self._async_execute_workflow(workflow_data, event))
+                    task.add_done_callback(done_queue.put_nowait)
+                    task_to_workflow[task] = workflow_data
+
+                while task_to_workflow:
+                    task = await done_queue.get()
+                    workflow_data = task_to_workflow.pop(task)
+                    workflow_name = workflow_data['name']
 
-                    for task in done:
-                        workflow_data = task_to_workflow[task]
-                        workflow_name = workflow_data['name']
+                    try:
+                        # 命中且不允许继续时，取消剩余工作流任务并收敛
+                        if await self._handle_workflow_result(event, task.result()):
+                            pending = list(task_to_workflow)
+                            for pending_task in pending:
+                                pending_task.cancel()
+                            if pending:
+                                await asyncio.gather(*pending, return_exceptions=True)
+                            break
 
-                        try:
-                            result = task.result()
-
-                            if result.get('handled'):
-                                # 发送响应（仅当是 BaseMessage 时）
-                                response = result.get('response')
-                                if response:
-                                    from Adapters.base.message import BaseMessage
-                                    if isinstance(response, BaseMessage):
-                                        await self._async_send_response(event, response)
-
-                                # 命中且不允许继续时，取消剩余工作流任务并收敛
-                                if not result.get('continue', True):
-                                    for pending_task in pending:
-                                        pending_task.cancel()
-                                    if pending:
-                                        await asyncio.gather(*pending, return_exceptions=True)
-                                    pending = set()
-                                    break
-
-                        except Exception as e:
-                            log_error(bot_id, f"工作流 {workflow_name} 执行异常: {e}",
-                                      "WORKFLOW_EXECUTION_ERROR", error=str(e), workflow=workflow_name)
+                    except Exception as e:
+                        log_error(bot_id, f"工作流 {workflow_name} 执行异常: {e}",
+                                  "WORKFLOW_EXECUTION_ERROR", error=str(e), workflow=workflow_name)
 
         except Exception as e:
-            import traceback
-            from Core.logging.file_logger import log_error
             log_error(bot_id or 0, f"异步消息处理异常: {e}", "ASYNC_MESSAGE_HANDLER_ERROR", error=str(e))
             log_error(bot_id or 0, f"异步消息处理异常堆栈", "ASYNC_MESSAGE_HANDLER_TRACEBACK",
                       traceback=traceback.format_exc())
 
         finally:
-            # 清除 current_event
-            from Core.message.builder import MessageBuilder
-            MessageBuilder.clear_current_event()
+            # 仅在设置过 current_event 时恢复（元事件提前返回时无需处理）
+            if event_token is not None:
+                MessageBuilder.clear_current_event(event_token)
+
+    async def _handle_workflow_result(self, event, result) -> bool:
+        """
+        处理单个工作流的执行结果
+
+        Returns:
+            bool: 是否命中且要求停止后续工作流
+        """
+        if not result.get('handled'):
+            return False
+
+        # 发送响应（仅当是 BaseMessage 时）
+        response = result.get('response')
+        if response and getattr(response, '__is_base_message__', False):
+            await self._async_send_response(event, response)
+
+        return not result.get('continue', True)
 
     async def _async_execute_workflow(self, workflow_data, event):
         """
         异步执行工作流
+
+        在 _async_process_message 推入的 app_context 中运行（任务创建时继承上下文），
+        同一事件的所有工作流共享该上下文，这里不再单独入栈
         
         Args:
             workflow_data: 工作流数据字典
@@ -155,8 +217,6 @@ class MessageHandler:
         Returns:
             dict: 工作流执行结果
         """
-        from Core.workflow.cache import workflow_cache
-
         engine = workflow_cache.acquire_engine(workflow_data)
         try:
             # 异步执行工作流
@@ -174,11 +234,8 @@ class MessageHandler:
             timeout: 超时时间（秒）
         """
         try:
-            from Core.logging.file_logger import log_debug, log_error
-            from Adapters.base.message import BaseMessage
-
             # 验证是 BaseMessage 对象
-            if not isinstance(response, BaseMessage):
+            if not getattr(response, '__is_base_message__', False):
                 log_error(event.bot.adapter.bot_id,
                           f"响应必须是 BaseMessage 对象，得到: {type(response)}",
                           "INVALID_RESPONSE_TYPE")
@@ -201,5 +258,4 @@ class MessageHandler:
                           "ASYNC_SEND_ERROR", error=str(e))
 
         except Exception as e:
-            from Core.logging.file_logger import log_error
             log_error(0, f"发送响应失败: {e}", "SEND_RESPONSE_ERROR", error=str(e))
@@ -5,18 +5,25 @@
 符合QQ官方API要求：相同的 msg_id + msg_seq 组合不能重复发送。
 """
 
+import random
 import threading
 import time
+from collections import OrderedDict
 from typing import Optional
 
+# 无 msg_id 时生成随机序号用
+_randint = random.Random().randint
+
 
 class MsgSeqManager:
     """消息序号管理器 - 基于msg_id的递增计数器"""
 
     def __init__(self):
-        self.msg_counters = {}  # {msg_id: counter}
+        self.msg_counters: OrderedDict[str, int] = OrderedDict()  # {msg_id: counter}，按插入顺序淘汰
         self.max_msg_ids = 100  # 只保留最近100个消息的计数器，防止内存泄漏
-        self._lock = threading.Lock()  # 线程安全锁
+        # 按 msg_id 哈希分段加锁，不同消息的计数互不阻塞
+        self._stripes = tuple(threading.Lock() for _ in range(16))
+        self._cleanup_lock = threading.Lock()  # 淘汰旧计数器用
 
     def get_msg_seq(self, msg_id: Optional[str] = None) -> int:
         """
@@ -34,53 +41,46 @@ class MsgSeqManager:
         """
         if not msg_id:
             # 没有msg_id时使用时间戳+随机数，确保唯一性
-            import random
-            timestamp_part = int(time.time() * 1000) % 1000  # 时间戳后3位
-            random_part = random.randint(100, 999)  # 3位随机数
+            timestamp_part = (time.monotonic_ns() // 1_000_000) % 1000  # 毫秒时钟后3位
+            random_part = _randint(100, 999)  # 3位随机数
             return timestamp_part * 1000 + random_part
 
-        with self._lock:
-            if msg_id not in self.msg_counters:
-                # 新消息，从1开始计数
-                self.msg_counters[msg_id] = 1
-                self._cleanup_old_counters()
-            else:
-                # 已存在的消息，递增计数
-                self.msg_counters[msg_id] += 1
+        with self._stripes[hash(msg_id) & 15]:
+            # 新消息从1开始计数，已存在的消息递增
+            seq = self.msg_counters.get(msg_id, 0) + 1
+            self.msg_counters[msg_id] = seq
+
+        if seq == 1:
+            self._cleanup_old_counters()
 
-            return self.msg_counters[msg_id]
+        return seq
 
     def _cleanup_old_counters(self):
         """清理旧的计数器，防止内存泄漏"""
-        if len(self.msg_counters) > self.max_msg_ids:
-            # 删除最旧的计数器（FIFO）
-            oldest_key = next(iter(self.msg_counters))
-            del self.msg_counters[oldest_key]
+        if len(self.msg_counters) <= self.max_msg_ids:
+            return
+        with self._cleanup_lock:
+            while len(self.msg_counters) > self.max_msg_ids:
+                # 删除最旧的计数器（FIFO）
+                self.msg_counters.popitem(last=False)
 
     def get_counter_stats(self) -> dict:
         """获取计数器统计信息"""
-        with self._lock:
-            return {
-                'total_msg_ids': len(self.msg_counters),
-                'max_seq_value': max(self.msg_counters.values()) if self.msg_counters else 0,
-                'memory_usage_kb': len(str(self.msg_counters)) / 1024
-            }
+        with self._cleanup_lock:
+            counters = dict(self.msg_counters)
+        return {
+            'total_msg_ids': len(counters),
+            'max_seq_value': max(counters.values()) if counters else 0,
+            'memory_usage_kb': len(str(counters)) / 1024
+        }
 
 
-# 全局单例实例
-_msg_seq_manager = None
-_manager_lock = threading.Lock()
+# 全局单例实例（模块导入时创建）
+_msg_seq_manager = MsgSeqManager()
 
 
 def get_msg_seq_manager() -> MsgSeqManager:
-    """获取全局msgseq管理器实例（单例模式）"""
-    global _msg_seq_manager
-
-    if _msg_seq_manager is None:
-        with _manager_lock:
-            if _msg_seq_manager is None:
-                _msg_seq_manager = MsgSeqManager()
-
+    """获取全局msgseq管理器实例"""
     return _msg_seq_manager
 
 
@@ -94,4 +94,4 @@ def get_msg_seq(msg_id: Optional[str] = None) -> int:
     Returns:
         int: 消息序号
     """
-    return get_msg_seq_manager().get_msg_seq(msg_id)
+    return _msg_seq_manager.get_msg_seq(msg_id)
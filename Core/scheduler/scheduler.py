@@ -5,14 +5,91 @@
 """
 
 import asyncio
+import re
 import threading
+import time
+from functools import lru_cache
 from typing import Dict, Any, Optional, List
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 
+from Adapters import get_adapter_manager
 from Core.logging.file_logger import log_info, log_error, log_debug, log_warn
+from Core.message.dispatcher import message_async_dispatcher
+from Core.utils.context import with_app_context_async
+from Core.workflow.engine import WorkflowEngine
+from Models import Bot as BotModel, UserWorkflow
+
+# cron 单个字段允许的字符：数字、*、?、范围/列表/步长符号，以及 mon/jan 等英文缩写
+_CRON_FIELD_RE = re.compile(r'^[0-9A-Za-z*?,/\-]+$')
+
+# 工作流订阅关系缓存有效期（秒）
+_SUBSCRIPTION_CACHE_TTL = 60
+
+# cron 星期字段 -> 中文名称
+_WEEKDAY_NAMES = {'0': '周日', '1': '周一', '2': '周二', '3': '周三',
+                  '4': '周四', '5': '周五', '6': '周六', '7': '周日'}
+
+
+@lru_cache(maxsize=256)
+def _cached_parse_cron(fields: tuple[str, ...]) -> Optional[CronTrigger]:
+    """
+    按 5 个字段构建 CronTrigger 并缓存（无效表达式缓存为 None）
+
+    CronTrigger 本身无状态，相同表达式的任务可以共享同一实例
+    """
+    minute, hour, day, month, day_of_week = fields
+    try:
+        return CronTrigger(
+            minute=minute,
+            hour=hour,
+            day=day,
+            month=month,
+            day_of_week=day_of_week
+        )
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=128)
+def _cron_describe(cron_expr: str) -> str:
+    """
+    将 cron 表达式转换为人类可读描述（结果只取决于表达式，按表达式缓存）
+    
+    Args:
+        cron_expr: cron 表达式
+        
+    Returns:
+        str: 描述文本
+    """
+    try:
+        parts = cron_expr.strip().split()
+        if len(parts) != 5:
+            return cron_expr
+            
+        minute, hour, day, month, day_of_week = parts
+        
+        # 简单场景的描述
+        if day == '*' and month == '*':
+            if day_of_week == '*':
+                # 每天
+                if hour != '*' and minute != '*':
+                    return f"每天 {hour.zfill(2)}:{minute.zfill(2)}"
+                elif hour != '*':
+                    return f"每天 {hour.zfill(2)} 点"
+            else:
+                # 每周特定天
+                day_name = _WEEKDAY_NAMES.get(day_of_week, day_of_week)
+                if hour != '*' and minute != '*':
+                    return f"每{day_name} {hour.zfill(2)}:{minute.zfill(2)}"
+        
+        # 复杂场景直接返回 cron
+        return f"cron: {cron_expr}"
+        
+    except Exception:
+        return cron_expr
 
 
 class SchedulerService:
@@ -34,6 +111,8 @@ class SchedulerService:
             self._initialized = True
             self._scheduler: Optional[BackgroundScheduler] = None
             self._jobs: Dict[int, str] = {}  # workflow_id -> job_id 映射
+            # workflow_id -> (订阅用户ID集合, 订阅用户的 bot ID集合, 写入时间)
+            self._subscription_cache: Dict[int, tuple[set, set, float]] = {}
             log_info(0, "定时调度器服务初始化", "SCHEDULER_SERVICE_INIT")
 
     def start(self):
@@ -78,10 +157,9 @@ class SchedulerService:
             log_error(0, "调度器未运行，无法添加任务", "SCHEDULER_NOT_RUNNING")
             return False
 
-        try:
-            # 移除已存在的任务
-            self.remove_workflow_job(workflow_id)
+        self.invalidate_subscription_cache(workflow_id)
 
+        try:
             schedule_config = config.get('schedule', {})
             schedule_type = schedule_config.get('type', 'cron')
             
@@ -102,7 +180,7 @@ class SchedulerService:
                           workflow_id=workflow_id)
                 return False
 
-            # 添加任务
+            # 添加任务（replace_existing 原子替换同 ID 的已有任务）
             self._scheduler.add_job(
                 func=self._execute_scheduled_workflow,
                 trigger=trigger,
@@ -139,6 +217,7 @@ class SchedulerService:
         if not self._scheduler:
             return False
 
+        self.invalidate_subscription_cache(workflow_id)
         job_id = self._jobs.get(workflow_id)
         if job_id:
             try:
@@ -150,6 +229,13 @@ class SchedulerService:
                 log_debug(0, f"移除任务时出错（可能不存在）: {e}", "SCHEDULER_REMOVE_JOB_ERROR")
         return False
 
+    def invalidate_subscription_cache(self, workflow_id: Optional[int] = None):
+        """订阅关系或 bot 所有者变更后清除缓存，不传 workflow_id 时清空全部"""
+        if workflow_id is None:
+            self._subscription_cache.clear()
+        else:
+            self._subscription_cache.pop(workflow_id, None)
+
     def update_workflow_job(self, workflow_id: int, config: Dict[str, Any]) -> bool:
         """
         更新定时工作流任务
@@ -161,9 +247,13 @@ class SchedulerService:
         Returns:
             bool: 是否更新成功
         """
-        # 简单地移除再添加
+        # 直接添加，由 replace_existing 替换旧任务
+        if self.add_workflow_job(workflow_id, config):
+            return True
+
+        # 新配置无效时移除旧任务，避免继续按旧配置执行
         self.remove_workflow_job(workflow_id)
-        return self.add_workflow_job(workflow_id, config)
+        return False
 
     def _parse_cron(self, cron_expr: str) -> Optional[CronTrigger]:
         """
@@ -177,24 +267,21 @@ class SchedulerService:
         Returns:
             CronTrigger 或 None
         """
-        try:
-            parts = cron_expr.strip().split()
-            if len(parts) == 5:
-                minute, hour, day, month, day_of_week = parts
-                return CronTrigger(
-                    minute=minute,
-                    hour=hour,
-                    day=day,
-                    month=month,
-                    day_of_week=day_of_week
-                )
-            else:
-                log_error(0, f"cron 表达式格式错误，需要5个字段: {cron_expr}", "INVALID_CRON_FORMAT")
-                return None
-        except Exception as e:
-            log_error(0, f"解析 cron 表达式失败: {e}", "CRON_PARSE_ERROR", cron=cron_expr)
+        parts = cron_expr.strip().split()
+        if len(parts) != 5:
+            log_error(0, f"cron 表达式格式错误，需要5个字段: {cron_expr}", "INVALID_CRON_FORMAT")
+            return None
+
+        # 先用正则快速排除含非法字符的字段，避免构建 CronTrigger 抛异常
+        if not all(_CRON_FIELD_RE.match(part) for part in parts):
+            log_error(0, f"cron 表达式包含非法字符: {cron_expr}", "INVALID_CRON_FORMAT")
             return None
 
+        trigger = _cached_parse_cron(tuple(parts))
+        if trigger is None:
+            log_error(0, f"解析 cron 表达式失败: {cron_expr}", "CRON_PARSE_ERROR", cron=cron_expr)
+        return trigger
+
     def _get_schedule_description(self, schedule_config: Dict[str, Any]) -> str:
         """
         生成调度描述文本
@@ -219,46 +306,7 @@ class SchedulerService:
                 return f"每 {minutes} 分钟"
         else:
             cron = schedule_config.get('cron', '0 8 * * *')
-            return self._cron_to_description(cron)
-
-    def _cron_to_description(self, cron_expr: str) -> str:
-        """
-        将 cron 表达式转换为人类可读描述
-        
-        Args:
-            cron_expr: cron 表达式
-            
-        Returns:
-            str: 描述文本
-        """
-        try:
-            parts = cron_expr.strip().split()
-            if len(parts) != 5:
-                return cron_expr
-                
-            minute, hour, day, month, day_of_week = parts
-            
-            # 简单场景的描述
-            if day == '*' and month == '*':
-                if day_of_week == '*':
-                    # 每天
-                    if hour != '*' and minute != '*':
-                        return f"每天 {hour.zfill(2)}:{minute.zfill(2)}"
-                    elif hour != '*':
-                        return f"每天 {hour.zfill(2)} 点"
-                else:
-                    # 每周特定天
-                    weekdays = {'0': '周日', '1': '周一', '2': '周二', '3': '周三', 
-                               '4': '周四', '5': '周五', '6': '周六', '7': '周日'}
-                    day_name = weekdays.get(day_of_week, day_of_week)
-                    if hour != '*' and minute != '*':
-                        return f"每{day_name} {hour.zfill(2)}:{minute.zfill(2)}"
-            
-            # 复杂场景直接返回 cron
-            return f"cron: {cron_expr}"
-            
-        except Exception:
-            return cron_expr
+            return _cron_describe(cron)
 
     def _execute_scheduled_workflow(self, workflow_id: int, config: Dict[str, Any]):
         """
@@ -270,45 +318,38 @@ class SchedulerService:
             workflow_id: 工作流ID
             config: 工作流配置
         """
-        from Core.utils.context import app_context
-        
-        with app_context():
-            try:
-                log_info(0, f"开始执行定时工作流: {config.get('name', workflow_id)}",
-                         "SCHEDULED_WORKFLOW_START", workflow_id=workflow_id)
-                # 在新的事件循环中执行异步任务
-                asyncio.run(self._async_execute_workflow(workflow_id, config))
-            except Exception as e:
-                log_error(0, f"定时工作流执行失败: {e}", "SCHEDULED_WORKFLOW_ERROR",
-                          workflow_id=workflow_id, error=str(e))
+        try:
+            log_info(0, f"开始执行定时工作流: {config.get('name', workflow_id)}",
+                     "SCHEDULED_WORKFLOW_START", workflow_id=workflow_id)
+            # 提交到常驻事件循环执行，避免每次触发都创建/销毁事件循环
+            # 阻塞等待完成，保持 max_instances=1 的并发语义
+            future = message_async_dispatcher.submit(
+                self._async_execute_workflow(workflow_id, config),
+                source="scheduled_workflow"
+            )
+            future.result()
+        except Exception as e:
+            log_error(0, f"定时工作流执行失败: {e}", "SCHEDULED_WORKFLOW_ERROR",
+                      workflow_id=workflow_id, error=str(e))
 
+    @with_app_context_async
     async def _async_execute_workflow(self, workflow_id: int, config: Dict[str, Any]):
         """
         异步执行定时工作流
         
         只对订阅了该工作流的用户的活跃 bot 执行。
-        注意: 调用者已经在同步入口推入了 app context
+        在常驻事件循环线程中运行，app context 由装饰器在协程内推入
         
         Args:
             workflow_id: 工作流ID
             config: 工作流配置
         """
-        from Core.workflow.engine import WorkflowEngine
-        from Adapters import get_adapter_manager
-        from Models.SQL.UserWorkflow import UserWorkflow
-        from Models import Bot as BotModel
-        
-        # 获取订阅了该工作流的用户ID列表
-        subscribed_user_ids = set()
-        try:
-            subscriptions = UserWorkflow.query.filter_by(
-                workflow_id=workflow_id,
-                enabled=True
-            ).all()
-            subscribed_user_ids = {sub.user_id for sub in subscriptions}
-        except Exception as e:
-            log_error(0, f"获取工作流订阅列表失败: {e}", "SCHEDULED_GET_SUBSCRIPTIONS_ERROR")
-            
+        cached = self._subscription_cache.get(workflow_id)
+        if cached and time.monotonic() - cached[2] < _SUBSCRIPTION_CACHE_TTL:
+            subscribed_user_ids, subscribed_bot_ids, _ = cached
+        else:
+            subscribed_user_ids, subscribed_bot_ids = self._load_subscriptions(workflow_id)
+
         if not subscribed_user_ids:
             log_debug(0, f"定时工作流无订阅用户: {config.get('name')}",
                       "SCHEDULED_WORKFLOW_NO_SUBSCRIBERS", workflow_id=workflow_id)
@@ -320,19 +361,11 @@ class SchedulerService:
             adapter_manager = get_adapter_manager()
             running_adapters = adapter_manager.running_adapters
             
-            # 通过数据库查询订阅用户的 bot
-            subscribed_bots = BotModel.query.filter(
-                BotModel.owner_id.in_(subscribed_user_ids),
-                BotModel.is_active == True
-            ).all()
-            subscribed_bot_ids = {b.id for b in subscribed_bots}
-            
-            # 过滤出订阅用户的活跃 bot
-            for bot_id, adapter in running_adapters.items():
-                if bot_id in subscribed_bot_ids:
-                    bot = adapter.bot if hasattr(adapter, 'bot') else None
-                    if bot:
-                        active_bots.append(bot)
+            # 过滤出订阅用户的活跃 bot（取交集，只遍历既订阅又在运行的 bot）
+            for bot_id in subscribed_bot_ids & running_adapters.keys():
+                bot = getattr(running_adapters[bot_id], 'bot', None)
+                if bot:
+                    active_bots.append(bot)
                     
         except Exception as e:
             log_error(0, f"获取订阅用户的活跃 bot 失败: {e}", "SCHEDULED_GET_BOTS_ERROR")
@@ -342,21 +375,22 @@ class SchedulerService:
                       "SCHEDULED_WORKFLOW_NO_BOTS", workflow_id=workflow_id)
             return
         
-        # 对每个订阅的 bot 执行工作流
-        handled_count = 0
-        for bot in active_bots:
-            event = ScheduledEvent(
-                workflow_name=config.get('name', str(workflow_id)),
-                bot=bot
-            )
+        # 对每个订阅的 bot 并发执行工作流（I/O 密集，总耗时取决于最慢的 bot 而非总和）
+        # 引擎只持有配置，运行状态在每次 execute 的上下文中，所有 bot 共用一个引擎
+        workflow_name = config.get('name', str(workflow_id))
+        engine = WorkflowEngine(config, name=config.get('name'))
+        results = await asyncio.gather(
+            *(engine.execute(ScheduledEvent(workflow_name=workflow_name, bot=bot))
+              for bot in active_bots),
+            return_exceptions=True
+        )
 
-            engine = WorkflowEngine(config, name=config.get('name'))
-            try:
-                result = await engine.execute(event)
-            except Exception as e:
-                log_error(0, f"工作流执行异常: {e}", "SCHEDULED_WORKFLOW_EXECUTE_ERROR",
+        handled_count = 0
+        for bot, result in zip(active_bots, results):
+            if isinstance(result, BaseException):
+                log_error(0, f"工作流执行异常: {result}", "SCHEDULED_WORKFLOW_EXECUTE_ERROR",
                           workflow_id=workflow_id, bot_id=bot.self_id)
-                result = {}
+                continue
 
             if result.get('handled'):
                 handled_count += 1
@@ -368,6 +402,43 @@ class SchedulerService:
             log_debug(0, f"定时工作流未产生处理结果: {config.get('name')}",
                       "SCHEDULED_WORKFLOW_NO_RESPONSE", workflow_id=workflow_id)
 
+    def _load_subscriptions(self, workflow_id: int) -> tuple[set, set]:
+        """
+        查询工作流的订阅用户及其 bot，查询成功时写入缓存
+
+        Args:
+            workflow_id: 工作流ID
+
+        Returns:
+            tuple: (订阅用户ID集合, 订阅用户的 bot ID集合)
+        """
+        # 获取订阅了该工作流的用户ID列表
+        try:
+            subscriptions = UserWorkflow.query.filter_by(
+                workflow_id=workflow_id,
+                enabled=True
+            ).all()
+            subscribed_user_ids = {sub.user_id for sub in subscriptions}
+        except Exception as e:
+            log_error(0, f"获取工作流订阅列表失败: {e}", "SCHEDULED_GET_SUBSCRIPTIONS_ERROR")
+            return set(), set()
+
+        subscribed_bot_ids = set()
+        if subscribed_user_ids:
+            # 通过数据库查询订阅用户的 bot
+            try:
+                subscribed_bots = BotModel.query.filter(
+                    BotModel.owner_id.in_(subscribed_user_ids),
+                    BotModel.is_active == True
+                ).all()
+                subscribed_bot_ids = {b.id for b in subscribed_bots}
+            except Exception as e:
+                log_error(0, f"获取订阅用户的 bot 失败: {e}", "SCHEDULED_GET_BOTS_ERROR")
+                return subscribed_user_ids, set()
+
+        self._subscription_cache[workflow_id] = (subscribed_user_ids, subscribed_bot_ids, time.monotonic())
+        return subscribed_user_ids, subscribed_bot_ids
+
     def sync_scheduled_workflows_from_cache(self, workflows: List[Dict[str, Any]]) -> int:
         """
         从工作流缓存同步定时任务
@@ -382,13 +453,10 @@ class SchedulerService:
             log_warn(0, "调度器未运行，跳过缓存同步", "SCHEDULER_SYNC_SKIPPED")
             return 0
 
-        # 先清空现有任务映射（避免逐条 remove 产生噪音日志）
-        for workflow_id, job_id in list(self._jobs.items()):
-            try:
-                self._scheduler.remove_job(job_id)
-            except Exception:
-                pass
+        # 先清空现有任务（调度器只承载工作流任务，一次性清空任务存储）
+        self._scheduler.remove_all_jobs()
         self._jobs.clear()
+        self._subscription_cache.clear()
 
         scheduled_count = 0
         for workflow_item in workflows or []:
@@ -422,15 +490,16 @@ class SchedulerService:
         if not self._scheduler:
             return []
 
-        jobs = []
-        for job in self._scheduler.get_jobs():
-            jobs.append({
+        # 调度精度为秒，省去微秒部分的格式化
+        return [
+            {
                 'id': job.id,
                 'name': job.name,
-                'next_run_time': job.next_run_time.isoformat() if job.next_run_time else None,
+                'next_run_time': job.next_run_time.isoformat(timespec='seconds') if job.next_run_time else None,
                 'trigger': str(job.trigger)
-            })
-        return jobs
+            }
+            for job in self._scheduler.get_jobs()
+        ]
 
 
 class ScheduledEvent:
@@ -441,6 +510,10 @@ class ScheduledEvent:
     定时工作流没有实际的消息来源，用户需要在工作流节点中自行配置发送目标。
     """
 
+    __slots__ = ('workflow_name', 'bot', 'bot_id', 'target_type', 'target_id',
+                 'message', 'message_id', 'user_id', 'group_id', 'is_scheduled',
+                 '_cached_protocol')
+
     def __init__(self, workflow_name: str, bot=None):
         """
         初始化定时事件
@@ -454,6 +527,8 @@ class ScheduledEvent:
         # bot 实例由调度器传入
         self.bot = bot
         self.bot_id = bot.self_id if bot else None
+        # 与消息事件一致提供协议名缓存，节点通过 event._cached_protocol 读取
+        self._cached_protocol = None
         self.target_type = None
         self.target_id = None
         
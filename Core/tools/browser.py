@@ -10,7 +10,10 @@ import threading
 import time
 from typing import Optional, Dict, Any
 
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemLoader, Template
+
+# 同时进行的渲染数上限（即复用页面池大小），限制突发渲染对单个浏览器进程的压力
+RENDER_CONCURRENCY = 2
 
 
 class BrowserManager:
@@ -34,6 +37,7 @@ class BrowserManager:
         self.playwright = None
         self.browser = None
         self.context = None
+        self._page_pool: Optional[asyncio.Queue] = None
 
         # 线程管理
         self.browser_thread = None
@@ -47,6 +51,8 @@ class BrowserManager:
             autoescape=True,
             cache_size=50
         )
+        # 已加载模板缓存：跳过 get_template 每次对模板文件的 mtime 检查（修改模板需重启生效）
+        self._template_cache: Dict[str, Template] = {}
 
         # 初始化标志
         self._initialized = True
@@ -114,7 +120,7 @@ class BrowserManager:
                 '--hide-scrollbars',
                 '--mute-audio',
                 '--disable-gpu',
-                '--single-process'  # 单进程模式，更快启动
+                '--process-per-site'  # 多进程模式：单个页面崩溃不会拖垮整个浏览器
             ]
         )
 
@@ -127,6 +133,11 @@ class BrowserManager:
             java_script_enabled=False  # 禁用JS提高性能
         )
 
+        # 复用页面池，避免每次渲染创建/销毁页面；池大小即渲染并发上限
+        self._page_pool = asyncio.Queue()
+        for _ in range(RENDER_CONCURRENCY):
+            self._page_pool.put_nowait(await self.context.new_page())
+
     def render(self, template_path: str, data: Dict[str, Any], width: int = 800, height: int = None) -> Optional[str]:
         """
         渲染模板为图片
@@ -148,7 +159,10 @@ class BrowserManager:
                 return None
 
         try:
-            template = self.jinja_env.get_template(template_path)
+            template = self._template_cache.get(template_path)
+            if template is None:
+                template = self.jinja_env.get_template(template_path)
+                self._template_cache[template_path] = template
             html_content = template.render(**data)
 
             future = asyncio.run_coroutine_threadsafe(
@@ -170,66 +184,81 @@ class BrowserManager:
     async def _render_html_async(self, html_content: str, width: int = None, height: int = None) -> Optional[bytes]:
         """异步渲染HTML（高性能版本）"""
 
-        if not self.context:
+        page_pool = self._page_pool
+        if not self.context or page_pool is None:
             return None
 
-        page = None
+        # 池中无空闲页面时等待，超出并发上限的渲染在此排队
+        page = await page_pool.get()
         try:
-            # 创建新页面
-            page = await self.context.new_page()
-
-            # 设置初始视口（使用默认值或自适应）
-            initial_width = width or 800
-            initial_height = height or 600
-            await page.set_viewport_size({"width": initial_width, "height": initial_height})
-
-            # 设置HTML内容（优化等待策略）
-            await page.set_content(html_content, wait_until="domcontentloaded")
-
-            # 减少等待时间
-            await page.wait_for_timeout(200)
-
-            # 获取实际尺寸并调整视口
-            actual_width = initial_width
-            actual_height = initial_height
-
-            if width is None or height is None:
-                # 获取内容的实际尺寸
-                dimensions = await page.evaluate("""
-                    () => {
-                        const body = document.body;
-                        const html = document.documentElement;
-                        return {
-                            width: Math.max(body.scrollWidth, body.offsetWidth, html.clientWidth, html.scrollWidth, html.offsetWidth),
-                            height: Math.max(body.scrollHeight, body.offsetHeight, html.clientHeight, html.scrollHeight, html.offsetHeight)
-                        };
-                    }
-                """)
-
-                if width is None:
-                    actual_width = min(dimensions['width'], 800)  # 限制最大宽度
-                if height is None:
-                    actual_height = min(dimensions['height'], 10000)  # 限制最大高度
-
-                # 重新设置视口
-                await page.set_viewport_size({"width": actual_width, "height": actual_height})
-
-            # 高质量截图
-            screenshot = await page.screenshot(
+            # 页面已关闭（崩溃或上次渲染失败）时重新创建
+            if page.is_closed():
+                page = await self.context.new_page()
+            return await self._render_on_page(page, html_content, width, height)
+        except Exception:
+            # 渲染失败时关闭页面，下次取出时重新创建
+            try:
+                await page.close()
+            except Exception:
+                pass
+            return None
+        finally:
+            page_pool.put_nowait(page)
+
+    async def _render_on_page(self, page, html_content: str, width: int = None, height: int = None) -> bytes:
+        """在复用页面上渲染HTML并截图"""
+        # 设置初始视口（使用默认值或自适应）
+        initial_width = width or 800
+        initial_height = height or 600
+        await page.set_viewport_size({"width": initial_width, "height": initial_height})
+
+        # 设置HTML内容（优化等待策略）
+        await page.set_content(html_content, wait_until="domcontentloaded")
+
+        # 等待图片/字体等资源加载完成（已就绪时立即返回），替代固定等待
+        await page.wait_for_load_state("load")
+
+        # 获取实际尺寸并调整视口
+        actual_width = initial_width
+        actual_height = initial_height
+
+        # 宽高均自适应时直接整页截图（宽度取默认视口，高度由 full_page 覆盖），省去一次 JS 往返和视口调整
+        if (width is None) != (height is None):
+            # 获取内容的实际尺寸
+            dimensions = await page.evaluate("""
+                () => {
+                    const body = document.body;
+                    const html = document.documentElement;
+                    return {
+                        width: Math.max(body.scrollWidth, body.offsetWidth, html.clientWidth, html.scrollWidth, html.offsetWidth),
+                        height: Math.max(body.scrollHeight, body.offsetHeight, html.clientHeight, html.scrollHeight, html.offsetHeight)
+                    };
+                }
+            """)
+
+            if width is None:
+                actual_width = min(dimensions['width'], 800)  # 限制最大宽度
+            if height is None:
+                actual_height = min(dimensions['height'], 10000)  # 限制最大高度
+
+            # 重新设置视口
+            await page.set_viewport_size({"width": actual_width, "height": actual_height})
+
+        # 宽高都已指定时按区域截图，避免整页截图重新计算整个可滚动区域
+        if width is not None and height is not None:
+            return await page.screenshot(
                 type="png",
-                full_page=True
+                clip={"x": 0, "y": 0, "width": actual_width, "height": actual_height},
+                omit_background=False
             )
 
-            return screenshot
+        # 高质量截图
+        screenshot = await page.screenshot(
+            type="png",
+            full_page=True
+        )
 
-        except Exception:
-            return None
-        finally:
-            if page:
-                try:
-                    await page.close()
-                except Exception:
-                    pass
+        return screenshot
 
     def stop(self):
         """停止浏览器管理器"""
@@ -269,6 +298,8 @@ class BrowserManager:
 
     async def _cleanup_browser(self):
         """清理浏览器资源"""
+        self._page_pool = None
+
         # 清理上下文
         if self.context:
             try:
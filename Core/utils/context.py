@@ -7,9 +7,14 @@ from functools import wraps
 from contextlib import contextmanager
 from typing import Optional, Any, Callable
 
+from flask import has_app_context
+
 # 全局 Flask app 引用
 _app = None
 
+# 是否已尝试过从 app 模块导入（失败结果同样缓存，避免每次进入上下文都重试导入）
+_import_attempted = False
+
 
 def init_app(app) -> None:
     """
@@ -43,19 +48,21 @@ def app_context():
         with app_context():
             result = UserWorkflow.query.filter_by(...).all()
     
-    如果 app 未初始化，直接执行不推入上下文
+    如果 app 未初始化，直接执行不推入上下文；
+    当前已处于 app context 中（嵌套调用）时复用现有上下文，不重复入栈
     """
-    global _app
+    global _app, _import_attempted
     
-    if _app is None:
-        # 尝试从 app 模块导入
+    if _app is None and not _import_attempted:
+        # 尝试从 app 模块导入（仅一次）
+        _import_attempted = True
         try:
             from app import app as flask_app
             _app = flask_app
         except ImportError:
             pass
     
-    if _app:
+    if _app and not has_app_context():
         ctx = _app.app_context()
         ctx.push()
         try:
@@ -63,7 +70,7 @@ def app_context():
         finally:
             ctx.pop()
     else:
-        yield None
+        yield _app
 
 
 def with_app_context(func: Callable) -> Callable:
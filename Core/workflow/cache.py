@@ -4,12 +4,23 @@
 提供内存缓存，避免每次消息都查询数据库
 缓存预过滤信息，提高执行效率
 """
+import hashlib
+import json
 import threading
-from collections import Counter
+import time
+from collections import Counter, defaultdict
 from typing import List, Dict, Any, Optional, Callable
 
 from Core.logging.file_logger import log_info, log_debug, log_error
 
+# 用户订阅列表缓存有效期（秒）
+_SUBSCRIPTION_CACHE_TTL = 60
+
+
+def _match_all(protocol: Optional[str], event_name: str) -> bool:
+    """未配置事件/协议过滤的工作流，匹配所有事件"""
+    return True
+
 
 class WorkflowCache:
     """工作流缓存管理器（单例）"""
@@ -28,15 +39,25 @@ class WorkflowCache:
         """初始化缓存"""
         if not hasattr(self, '_initialized'):
             self._initialized = True
-            self._workflows: List[Dict[str, Any]] = []  # 工作流列表
-            self._lock = threading.RLock()
+            # 写时复制：写操作在锁内构建新列表与索引后整体替换，读操作无需加锁
+            self._workflows: tuple[Dict[str, Any], ...] = ()  # 工作流列表（只读快照）
+            # 索引：触发类型 -> 工作流列表（保持优先级顺序）、工作流ID -> 工作流
+            self._by_trigger: Dict[str, tuple[Dict[str, Any], ...]] = {}
+            self._by_id: Dict[int, Dict[str, Any]] = {}
+            self._lock = threading.RLock()  # 仅用于串行化写操作
+            # user_id -> (订阅的工作流ID集合, 写入时间)
+            self._subscriptions: Dict[int, tuple[frozenset, float]] = {}
+            # (工作流ID, 配置摘要) -> 引擎，配置未变的工作流在重载后复用原引擎
+            self._engine_cache: Dict[tuple[int, str], Any] = {}
             log_info(0, "工作流缓存管理器初始化", "WORKFLOW_CACHE_INIT")
 
     def _build_cached_workflow(self, workflow) -> Dict[str, Any]:
-        """构建缓存项（含预过滤信息与引擎工厂）"""
+        """构建缓存项（含预过滤信息与共享引擎）"""
         config = workflow.get_config()
         trigger_type = config.get('trigger_type', 'message')
-        engine_factory = self._build_engine_factory(workflow.id, workflow.name, config)
+        engine = self._get_or_build_engine(workflow.id, workflow.name, config)
+        event_filter_set = frozenset(config.get('event_filter') or ()) or None
+        protocols_set = frozenset(config.get('protocols') or ()) or None
         return {
             'id': workflow.id,
             'name': workflow.name,
@@ -44,10 +65,37 @@ class WorkflowCache:
             'config': config,
             'enabled': workflow.enabled,
             'trigger_type': trigger_type,
+            # 事件/协议过滤条件预先转为集合，None 表示不限制
+            'event_filter_set': event_filter_set,
+            'protocols_set': protocols_set,
+            'matches': self._build_matcher(event_filter_set, protocols_set),
             'message_prefilter': self._extract_message_prefilter(config),
-            'engine_factory': engine_factory,
+            'engine': engine,
         }
 
+    @staticmethod
+    def _build_matcher(event_filter_set: Optional[frozenset],
+                       protocols_set: Optional[frozenset]) -> Callable[[Optional[str], str], bool]:
+        """
+        构建事件名称/协议过滤函数 matches(protocol, event_name)
+
+        按是否配置了过滤条件生成最简判断，无条件的工作流直接返回 True
+        """
+        if event_filter_set is None and protocols_set is None:
+            return _match_all
+
+        if protocols_set is None:
+            def matches(protocol, event_name):
+                return not event_name or event_name in event_filter_set
+        elif event_filter_set is None:
+            def matches(protocol, event_name):
+                return not protocol or protocol in protocols_set
+        else:
+            def matches(protocol, event_name):
+                return ((not event_name or event_name in event_filter_set)
+                        and (not protocol or protocol in protocols_set))
+        return matches
+
     @staticmethod
     def _extract_message_prefilter(config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
@@ -131,21 +179,29 @@ class WorkflowCache:
         ]
         return filtered
 
-    @staticmethod
-    def _build_engine_factory(workflow_id: int, workflow_name: str, config: Dict[str, Any]) -> Callable:
-        """构建轻量引擎工厂。"""
-        from Core.workflow.engine import WorkflowEngine
+    def _get_or_build_engine(self, workflow_id: int, workflow_name: str, config: Dict[str, Any]):
+        """
+        按 (工作流ID, 名称+配置摘要) 获取引擎，配置未变时复用已构建的引擎
 
-        def _factory():
-            return WorkflowEngine(config, name=workflow_name, workflow_id=workflow_id)
+        引擎只持有配置，运行状态在每次 execute 的上下文中，可被并发事件共享
+        """
+        from Core.workflow.engine import WorkflowEngine
 
-        return _factory
+        digest = hashlib.sha256(
+            json.dumps([workflow_name, config], sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')
+        ).hexdigest()
+        key = (workflow_id, digest)
+        engine = self._engine_cache.get(key)
+        if engine is None:
+            engine = WorkflowEngine(config, name=workflow_name, workflow_id=workflow_id)
+            self._engine_cache[key] = engine
+        return engine
 
     def acquire_engine(self, workflow_data: Dict[str, Any]):
-        """按工厂创建新引擎实例（不使用引擎池）。"""
-        engine_factory = workflow_data.get('engine_factory')
-        if engine_factory:
-            return engine_factory()
+        """获取缓存项的共享引擎（不使用引擎池）。"""
+        engine = workflow_data.get('engine')
+        if engine:
+            return engine
 
         # 兜底（兼容旧缓存结构）
         from Core.workflow.engine import WorkflowEngine
@@ -157,6 +213,26 @@ class WorkflowCache:
         """无池化模式下无需归还，保持接口兼容。"""
         return
 
+    def _publish(self, workflows: List[Dict[str, Any]]):
+        """
+        发布新的工作流快照及索引（需持有锁）
+
+        每个属性都是整体替换，读者读取任一属性得到的都是完整的某个版本
+        """
+        by_trigger = defaultdict(list)
+        for workflow in workflows:
+            by_trigger[workflow.get('trigger_type', 'message')].append(workflow)
+        self._by_trigger = {key: tuple(items) for key, items in by_trigger.items()}
+        self._by_id = {workflow['id']: workflow for workflow in workflows}
+        self._workflows = tuple(workflows)
+
+        # 淘汰已不在缓存中的引擎（工作流被删除/禁用或配置已变更）
+        live_engines = {workflow.get('engine') for workflow in workflows}
+        self._engine_cache = {
+            key: engine for key, engine in self._engine_cache.items()
+            if engine in live_engines
+        }
+
     def reload(self) -> int:
         """
         从数据库重新加载工作流到缓存
@@ -176,16 +252,15 @@ class WorkflowCache:
                         Workflow.priority.asc()
                     ).all()
 
-                    # 清空现有缓存
-                    self._workflows.clear()
-
-                    # 加载工作流并预编译引擎
+                    # 加载工作流并预编译引擎（构建完成后整体替换现有缓存）
                     type_counter = Counter()
+                    cached_workflows = []
                     for workflow in workflows:
                         cached_workflow = self._build_cached_workflow(workflow)
                         trigger_type = cached_workflow['trigger_type']
                         type_counter[trigger_type] += 1
-                        self._workflows.append(cached_workflow)
+                        cached_workflows.append(cached_workflow)
+                    self._publish(cached_workflows)
 
                     log_info(0, f"工作流缓存已重载: {len(self._workflows)} 个工作流 "
                              f"(消息: {type_counter['message']}, 定时: {type_counter['schedule']}, "
@@ -219,16 +294,18 @@ class WorkflowCache:
                     workflow = Workflow.query.get(workflow_id)
 
                     # 先移除旧缓存，再按当前状态决定是否回填
-                    self._workflows = [w for w in self._workflows if w['id'] != workflow_id]
+                    workflows = [w for w in self._workflows if w['id'] != workflow_id]
 
                     if not workflow or not workflow.enabled:
+                        self._publish(workflows)
                         log_debug(0, "增量刷新工作流缓存：工作流不存在或未启用",
                                   "WORKFLOW_CACHE_UPSERT_SKIPPED", workflow_id=workflow_id)
                         return None
 
                     cached_workflow = self._build_cached_workflow(workflow)
-                    self._workflows.append(cached_workflow)
-                    self._workflows.sort(key=lambda item: item.get('priority', 100))
+                    workflows.append(cached_workflow)
+                    workflows.sort(key=lambda item: item.get('priority', 100))
+                    self._publish(workflows)
 
                     log_debug(0, "增量刷新工作流缓存成功", "WORKFLOW_CACHE_UPSERT_OK",
                               workflow_id=workflow_id, trigger_type=cached_workflow.get('trigger_type'))
@@ -249,28 +326,48 @@ class WorkflowCache:
             bool: 是否有缓存项被移除
         """
         with self._lock:
-            before_count = len(self._workflows)
-            self._workflows = [w for w in self._workflows if w['id'] != workflow_id]
-            removed = len(self._workflows) < before_count
+            workflows = [w for w in self._workflows if w['id'] != workflow_id]
+            removed = len(workflows) < len(self._workflows)
             if removed:
+                self._publish(workflows)
                 log_debug(0, "已从缓存移除工作流", "WORKFLOW_CACHE_REMOVE_BY_ID",
                           workflow_id=workflow_id)
             return removed
 
-    def _get_subscribed_workflow_ids(self, user_id: Optional[int]) -> set:
-        """获取用户订阅的工作流ID集合"""
+    def _get_subscribed_workflow_ids(self, user_id: Optional[int]) -> frozenset:
+        """获取用户订阅的工作流ID集合（带TTL缓存）"""
         if not user_id:
-            return set()
+            return frozenset()
+
+        cached = self._subscriptions.get(user_id)
+        now = time.monotonic()
+        if cached and now - cached[1] < _SUBSCRIPTION_CACHE_TTL:
+            return cached[0]
+
         try:
+            from Core.utils.context import app_context
             from Models.SQL.UserWorkflow import UserWorkflow
-            subscriptions = UserWorkflow.query.filter_by(
-                user_id=user_id,
-                enabled=True
-            ).all()
-            return {sub.workflow_id for sub in subscriptions}
+
+            # 仅在缓存未命中、需要查库时进入 app_context
+            with app_context():
+                rows = UserWorkflow.query.filter_by(
+                    user_id=user_id,
+                    enabled=True
+                ).with_entities(UserWorkflow.workflow_id).all()
+            subscribed_ids = frozenset(row[0] for row in rows)
         except Exception as e:
             log_error(0, f"获取用户订阅列表失败: {e}", "WORKFLOW_GET_SUBSCRIPTIONS_ERROR")
-            return set()
+            return frozenset()
+
+        self._subscriptions[user_id] = (subscribed_ids, now)
+        return subscribed_ids
+
+    def invalidate_subscriptions(self, user_id: Optional[int] = None):
+        """用户订阅变更后清除缓存，不传 user_id 时清空全部"""
+        if user_id is None:
+            self._subscriptions.clear()
+        else:
+            self._subscriptions.pop(user_id, None)
 
     def get_workflows_by_trigger(self, trigger_type: str, protocol: Optional[str] = None,
                                   user_id: Optional[int] = None, event_name: str = '') -> List[Dict[str, Any]]:
@@ -286,78 +383,46 @@ class WorkflowCache:
         Returns:
             List[Dict]: 匹配的工作流列表
         """
-        with self._lock:
-            subscribed_ids = self._get_subscribed_workflow_ids(user_id)
-
-            result = []
-            skipped_by_trigger = 0
-            skipped_by_event = 0
-            skipped_by_subscribe = 0
-            skipped_by_protocol = 0
-            for workflow in self._workflows:
-                wf_trigger = workflow.get('trigger_type', 'message')
-                if wf_trigger != trigger_type:
-                    skipped_by_trigger += 1
-                    continue
-
-                config = workflow.get('config', {})
-
-                # 事件名称过滤（notice/request 事件）
-                if event_name:
-                    event_filter = config.get('event_filter', [])
-                    if event_filter and event_name not in event_filter:
-                        skipped_by_event += 1
-                        continue
-
-                # 订阅过滤
-                if user_id and workflow['id'] not in subscribed_ids:
-                    skipped_by_subscribe += 1
-                    continue
-
-                # 协议过滤
-                if protocol:
-                    allowed = config.get('protocols', [])
-                    if allowed and protocol not in allowed:
-                        skipped_by_protocol += 1
-                        continue
-
-                result.append(workflow)
-
-            return result
+        subscribed_ids = self._get_subscribed_workflow_ids(user_id)
+
+        # 读取当前快照（无锁），写操作只会整体替换索引，不会修改已发布的列表
+        # 事件名称/协议过滤由缓存时生成的 matches 完成，订阅过滤为集合查找
+        candidates = self._by_trigger.get(trigger_type, ())
+        if user_id:
+            return [
+                workflow for workflow in candidates
+                if workflow['id'] in subscribed_ids and workflow['matches'](protocol, event_name)
+            ]
+        return [workflow for workflow in candidates if workflow['matches'](protocol, event_name)]
 
     def get_all_workflows(self) -> List[Dict[str, Any]]:
         """获取所有缓存的工作流"""
-        with self._lock:
-            return list(self._workflows)
+        return list(self._workflows)
 
     def get_workflow_by_id(self, workflow_id: int) -> Optional[Dict[str, Any]]:
         """根据ID获取工作流"""
-        with self._lock:
-            for workflow in self._workflows:
-                if workflow['id'] == workflow_id:
-                    return workflow
-            return None
+        return self._by_id.get(workflow_id)
 
     def clear(self):
         """清空缓存"""
         with self._lock:
-            self._workflows.clear()
+            self._publish([])
             log_info(0, "工作流缓存已清空", "WORKFLOW_CACHE_CLEAR")
 
     def get_stats(self) -> Dict[str, Any]:
         """获取缓存统计信息"""
-        with self._lock:
-            return {
-                'total_workflows': len(self._workflows),
-                'workflows': [
-                    {
-                        'id': w['id'],
-                        'name': w['name'],
-                        'priority': w['priority']
-                    }
-                    for w in self._workflows
-                ]
-            }
+        workflows = self._workflows
+        return {
+            'total_workflows': len(workflows),
+            'workflows': [
+                {
+                    'id': w['id'],
+                    'name': w['name'],
+                    'priority': w['priority']
+                }
+                for w in workflows
+            ]
+        }
 
 
 # 全局单例实例
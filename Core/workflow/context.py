@@ -4,9 +4,74 @@
 管理工作流执行过程中的变量、事件和响应
 """
 import json
+from collections import ChainMap
+from functools import lru_cache
 from typing import Any
 
-from jinja2 import ChainableUndefined, Environment
+from jinja2 import ChainableUndefined, Environment, Template
+
+from .globals import global_variables
+
+try:
+    import orjson
+
+    def _json_check(value):
+        try:
+            orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # orjson 不支持的数据（如超过 64 位的整数）回退到标准库
+            json.dumps(value, default=str)
+except ImportError:
+    def _json_check(value):
+        json.dumps(value, default=str)
+
+# 复用的 JSON 编码器：json.dumps 传入非默认参数时每次调用都会新建编码器
+_encode_json = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def _json_safe_filter(s) -> str:
+    """json_safe 过滤器：转义字符串中的特殊字符，使其可以安全嵌入 JSON"""
+    return _encode_json(str(s))[1:-1] if s else ''
+
+
+# 共享模板环境（模块级单例，所有工作流复用）：使用 ChainableUndefined，避免缺失变量导致整段模板渲染失败
+_JINJA_ENV = Environment(undefined=ChainableUndefined)
+_JINJA_ENV.filters['json_safe'] = _json_safe_filter
+# 添加 tojson 过滤器：格式化任意对象为 JSON 字符串（支持缩进）
+_JINJA_ENV.filters['tojson'] = lambda value, indent=2: json.dumps(
+    value, ensure_ascii=False, indent=indent, default=str
+)
+
+
+@lru_cache(maxsize=1024)
+def _compile_template(template_str: str) -> Template:
+    """编译模板字符串并缓存，相同模板不再重复词法/语法分析"""
+    return _JINJA_ENV.from_string(template_str)
+
+
+@lru_cache(maxsize=1024)
+def _compile_accessor(key: str):
+    """将点号路径（如 response_json.data.code）编译为访问函数并缓存，避免每次拆分字符串"""
+    head, *rest = key.split('.')
+    rest = tuple(rest)
+
+    def accessor(variables: dict, default):
+        value = variables.get(head)
+        if value is None:
+            return default
+        try:
+            for part in rest:
+                if isinstance(value, dict):
+                    value = value.get(part)
+                else:
+                    value = getattr(value, part, None)
+                if value is None:
+                    return default
+            return value
+        except Exception:
+            return default
+
+    return accessor
 
 
 class MessageAPI:
@@ -31,6 +96,22 @@ class MessageAPI:
         self.send_message(content)
 
 
+class _Variables(dict):
+    """变量字典：message_api 在首次通过下标访问时才创建"""
+
+    __slots__ = ('_context',)
+
+    def __init__(self, context: "WorkflowContext"):
+        super().__init__()
+        self._context = context
+
+    def __missing__(self, key):
+        if key == 'message_api':
+            value = self[key] = MessageAPI(self._context)
+            return value
+        raise KeyError(key)
+
+
 class WorkflowContext:
     """工作流执行上下文"""
 
@@ -42,15 +123,17 @@ class WorkflowContext:
             event: BaseEvent 事件对象
         """
         self.event = event
-        self.variables = {}  # 变量存储
+        self.variables = _Variables(self)  # 变量存储
         self._response = None  # 响应消息
 
         # 设置事件原始数据
         if hasattr(event, 'raw_data'):
             self.variables['raw_data'] = event.raw_data
 
-        # 设置 message_api，用于代码片段中发送消息
-        self._setup_message_api()
+    @property
+    def message_api(self) -> MessageAPI:
+        """消息API，用于代码片段中发送消息（首次访问时创建）"""
+        return self.variables['message_api']
 
     def set_variable(self, key: str, value: Any):
         """
@@ -76,26 +159,12 @@ class WorkflowContext:
         # 先检查完整 key 是否存在（优先级最高）
         if key in self.variables:
             return self.variables[key]
+        if key == 'message_api':
+            return self.message_api
         
         # 如果包含点号，尝试嵌套访问
         if '.' in key:
-            parts = key.split('.')
-            value = self.variables.get(parts[0])
-            if value is None:
-                return default
-            try:
-                for part in parts[1:]:
-                    if isinstance(value, dict):
-                        value = value.get(part)
-                    elif hasattr(value, part):
-                        value = getattr(value, part)
-                    else:
-                        return default
-                    if value is None:
-                        return default
-                return value
-            except Exception:
-                return default
+            return _compile_accessor(key)(self.variables, default)
         return default
 
     def render_template(self, template_str: str) -> str:
@@ -114,22 +183,20 @@ class WorkflowContext:
         if not isinstance(template_str, str):
             template_str = str(template_str)
 
+        # 不含模板语法的纯文本直接返回（以换行结尾的交给 Jinja，保持其去除末尾换行的行为）
+        if '{' not in template_str and not template_str.endswith('\n'):
+            return template_str
+
         try:
-            from Core.workflow.globals import global_variables
-            
-            # 使用 ChainableUndefined，避免缺失变量导致整段模板渲染失败
-            env = Environment(undefined=ChainableUndefined)
-            # 添加 json_safe 过滤器：转义字符串中的特殊字符，使其可以安全嵌入 JSON
-            env.filters['json_safe'] = lambda s: json.dumps(str(s), ensure_ascii=False)[1:-1] if s else ''
-            # 添加 tojson 过滤器：格式化任意对象为 JSON 字符串（支持缩进）
-            env.filters['tojson'] = lambda value, indent=2: json.dumps(
-                value, ensure_ascii=False, indent=indent, default=str
-            )
-            template = env.from_string(template_str)
+            template = _compile_template(template_str)
             
             # 注入全局变量，支持 {{global.xxx}} 语法
-            render_vars = {**self.variables, 'global': global_variables.get_all()}
-            return template.render(**render_vars)
+            # 以 ChainMap 叠加变量与模板全局（shared 上下文直接引用，不复制变量字典）
+            render_vars = ChainMap(
+                {'global': global_variables.get_snapshot()}, self.variables, template.globals
+            )
+            context = template.new_context(render_vars, shared=True)
+            return _JINJA_ENV.concat(template.root_render_func(context))
         except Exception as e:
             # 如果模板渲染失败，返回原字符串
             return template_str
@@ -172,12 +239,8 @@ class WorkflowContext:
                 continue
             try:
                 # 尝试序列化测试
-                json.dumps(value, default=str)
+                _json_check(value)
                 result[key] = value
             except Exception:
                 result[key] = str(value)[:500]
         return result
-
-    def _setup_message_api(self):
-        """设置 message_api，用于代码片段中发送消息"""
-        self.variables['message_api'] = MessageAPI(self)
@@ -4,15 +4,92 @@
 保存和读取工作流执行的调试信息到 Redis
 """
 import json
+import threading
 import time
+from collections import deque
+from itertools import islice
+from queue import Queue, Empty
 from typing import Any
 
 from Core.logging.file_logger import log_error
 from Database.Redis.keys import workflow_debug_key
 
+try:
+    import orjson
+
+    def _json_dumps(data) -> bytes | str:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # orjson 不支持的数据（如超过 64 位的整数）回退到标准库
+            return json.dumps(data, ensure_ascii=False)
+except ImportError:
+    def _json_dumps(data) -> bytes | str:
+        return json.dumps(data, ensure_ascii=False)
+
 # 调试记录过期时间（秒），默认 1 小时
 DEBUG_EXPIRE_SECONDS = 3600
 
+# 单条记录最多保留的节点数（超出时保留最后的节点）
+MAX_DEBUG_NODES = 200
+
+# 节点输入/输出截断限制：嵌套深度、字符串长度、列表/字典条目数
+_MAX_DEPTH = 4
+_MAX_STR_LEN = 500
+_MAX_ITEMS = 50
+
+# 后台批量写入：单批最多条数 / 最长等待时间（秒）
+DEBUG_FLUSH_BATCH_SIZE = 64
+DEBUG_FLUSH_INTERVAL = 0.1
+
+# 待写入的调试记录队列，元素为 (key, record)
+_debug_flush_queue: Queue = Queue()
+_flush_thread: threading.Thread | None = None
+_flush_thread_lock = threading.Lock()
+
+
+def _ensure_flush_thread():
+    """首次保存调试记录时启动后台写入线程"""
+    global _flush_thread
+    if _flush_thread is not None:
+        return
+    with _flush_thread_lock:
+        if _flush_thread is None:
+            _flush_thread = threading.Thread(
+                target=_flush_debug_records, name="workflow-debug-flush", daemon=True
+            )
+            _flush_thread.start()
+
+
+def _flush_debug_records():
+    """后台线程：攒批后通过一次 pipeline 写入 Redis，序列化也在此完成，不占用事件循环"""
+    from Database.Redis.client import set_values
+
+    while True:
+        batch = {}
+        key, record = _debug_flush_queue.get()
+        batch[key] = record
+        deadline = time.monotonic() + DEBUG_FLUSH_INTERVAL
+        while len(batch) < DEBUG_FLUSH_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                key, record = _debug_flush_queue.get(timeout=remaining)
+            except Empty:
+                break
+            # 同一工作流在一批内多次执行时只保留最新记录
+            batch[key] = record
+
+        try:
+            set_values(
+                {key: _json_dumps(record) for key, record in batch.items()},
+                expire_seconds=DEBUG_EXPIRE_SECONDS
+            )
+        except Exception as e:
+            log_error(0, f"批量保存工作流调试记录失败: {e}", "WORKFLOW_DEBUG_SAVE_ERROR",
+                      count=len(batch), error=str(e))
+
 
 class WorkflowDebugRecorder:
     """工作流调试记录器"""
@@ -27,7 +104,8 @@ class WorkflowDebugRecorder:
         """
         self.workflow_id = workflow_id
         self.workflow_name = workflow_name
-        self.nodes = []
+        self.nodes = deque(maxlen=MAX_DEBUG_NODES)
+        self.node_count = 0
         self.trigger_time = None
         self.trigger_message = None
         self.user_id = None
@@ -71,27 +149,45 @@ class WorkflowDebugRecorder:
             duration_ms: 执行时长（毫秒）
             input_data: 输入数据（上下文变量）
         """
-        # 处理 output，确保可序列化且不过长
-        output_str = self._serialize_data(output)
-        input_str = self._serialize_data(input_data)
-
+        self.node_count += 1
+        # 只保存引用（变量做浅拷贝，避免后续节点修改），序列化推迟到 finish 时统一进行
         self.nodes.append({
             "id": node_id,
             "type": node_type,
             "status": status,
-            "input": input_str,
-            "output": output_str,
+            "input": dict(input_data) if input_data is not None else None,
+            "output": output,
             "error": error[:500] if error else None,
             "duration_ms": duration_ms
         })
     
-    def _serialize_data(self, data: Any) -> Any:
-        """序列化数据"""
-        if data is None:
+    @staticmethod
+    def _filter_variables(variables: dict | None) -> dict | None:
+        """排除内部变量（_ 开头）与 message_api"""
+        if variables is None:
             return None
+        return {
+            key: value for key, value in variables.items()
+            if not key.startswith('_') and key != 'message_api'
+        }
+
+    def _serialize_data(self, data: Any, depth: int = 0) -> Any:
+        """单遍转换为可 JSON 序列化的数据，按深度/长度/条目数截断"""
+        if data is None or isinstance(data, (bool, int, float)):
+            return data
+        if isinstance(data, str):
+            return data[:_MAX_STR_LEN]
+        if depth >= _MAX_DEPTH:
+            return str(data)[:_MAX_STR_LEN]
+        if isinstance(data, dict):
+            return {
+                str(key): self._serialize_data(value, depth + 1)
+                for key, value in islice(data.items(), _MAX_ITEMS)
+            }
+        if isinstance(data, (list, tuple, set, frozenset)):
+            return [self._serialize_data(item, depth + 1) for item in islice(data, _MAX_ITEMS)]
         try:
-            serialized = json.dumps(data, ensure_ascii=False, default=str)
-            return json.loads(serialized)
+            return str(data)[:_MAX_STR_LEN]
         except Exception as e:
             return f"(序列化失败: {str(e)[:100]})"
 
@@ -103,17 +199,21 @@ class WorkflowDebugRecorder:
             success: 是否成功
             error: 错误信息
         """
+        self.nodes = list(self.nodes)
         self.status = "success" if success else "error"
         self.error = error[:500] if error else None
+
+        # 统一序列化节点输入/输出，确保可序列化且不过长
+        for node in self.nodes:
+            node["input"] = self._serialize_data(self._filter_variables(node["input"]))
+            node["output"] = self._serialize_data(node["output"])
         
         # 保存到 Redis
         self._save_to_redis()
 
     def _save_to_redis(self):
-        """保存调试记录到 Redis（按 workflow_id 分开存储）"""
+        """将调试记录加入后台写入队列（按 workflow_id 分开存储）"""
         try:
-            from Database.Redis.client import set_value
-            
             record = {
                 "workflow_id": self.workflow_id,
                 "workflow_name": self.workflow_name,
@@ -123,12 +223,12 @@ class WorkflowDebugRecorder:
                 "group_id": self.group_id,
                 "status": self.status,
                 "error": self.error,
-                "nodes": self.nodes
+                "nodes": self.nodes,
+                "skipped_nodes": self.node_count - len(self.nodes)
             }
             
-            key = workflow_debug_key(self.workflow_id)
-            value = json.dumps(record, ensure_ascii=False)
-            set_value(key, value, expire_seconds=DEBUG_EXPIRE_SECONDS)
+            _ensure_flush_thread()
+            _debug_flush_queue.put_nowait((workflow_debug_key(self.workflow_id), record))
             
         except Exception as e:
             log_error(0, f"保存工作流调试记录失败: {e}", "WORKFLOW_DEBUG_SAVE_ERROR",
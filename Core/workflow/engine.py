@@ -4,12 +4,13 @@
 负责加载工作流配置、执行节点、管理上下文
 """
 import asyncio
-import time
+from time import perf_counter_ns
 from typing import Any, Optional
 
 from Core.logging.file_logger import log_info, log_error, log_debug
 from Core.logging.utils import format_exception
 from .context import WorkflowContext
+from .nodes.base import BaseNode
 from .registry import NodeRegistry
 from .debug import WorkflowDebugRecorder
 
@@ -30,6 +31,27 @@ class WorkflowEngine:
         self.name = name or config.get('name', 'Unnamed Workflow')
         self.workflow_id = workflow_id
         self.workflow_steps = config.get('workflow', []) or []
+        # 调试记录默认开启，可通过配置 debug_enabled=False 关闭
+        self._debug_enabled = config.get('debug_enabled', True)
+
+        # 节点列表在引擎生命周期内不变，预先计算索引、ID、类型与节点类，避免每次执行重复构建
+        self._node_index_map = {step.get('id'): idx for idx, step in enumerate(self.workflow_steps)}
+        self._node_types = [step.get('type') for step in self.workflow_steps]
+        self._node_ids = [step.get('id', f"step_{step.get('type')}") for step in self.workflow_steps]
+        self._node_classes = [NodeRegistry.get_node(node_type) for node_type in self._node_types]
+        self._node_configs = [step.get('config', {}) for step in self.workflow_steps]
+        # 无状态节点只实例化一次，有状态节点（STATELESS=False）每次执行时新建
+        self._node_instances = [
+            node_class(node_config) if node_class and node_class.STATELESS else None
+            for node_class, node_config in zip(self._node_classes, self._node_configs)
+        ]
+        # 仅覆盖了 should_break 的节点类需要判断中断，其余节点（基类恒返回 False）跳过调用
+        self._break_checks = [
+            node_class.should_break
+            if node_class and node_class.should_break is not BaseNode.should_break else None
+            for node_class in self._node_classes
+        ]
+        self._start_index = self._find_start_index()
 
     def _find_start_index(self) -> Optional[int]:
         """返回 start 节点索引；未找到时返回 None。"""
@@ -48,7 +70,7 @@ class WorkflowEngine:
         Returns:
             dict: {'handled': bool, 'response': BaseMessage, 'continue': bool}
         """
-        start_time = time.time()
+        start_time = perf_counter_ns()
         debug_recorder: WorkflowDebugRecorder | None = None
 
         try:
@@ -62,7 +84,7 @@ class WorkflowEngine:
                 return {'handled': False}
 
             # 3. 初始化调试记录器
-            if self.workflow_id:
+            if self.workflow_id and self._debug_enabled:
                 debug_recorder = WorkflowDebugRecorder(self.workflow_id, self.name)
                 debug_recorder.start(event)
 
@@ -77,7 +99,7 @@ class WorkflowEngine:
                 if debug_recorder:
                     debug_recorder.finish(success=True)
                     
-                elapsed = time.time() - start_time
+                elapsed = (perf_counter_ns() - start_time) / 1e9
                 log_info(0, f"[{self.name}] 处理完成 ({elapsed:.3f}s)", "WORKFLOW_SUCCESS")
                 return {
                     'handled': True,
@@ -96,40 +118,44 @@ class WorkflowEngine:
 
     async def _run_nodes(self, context: WorkflowContext, debug_recorder: WorkflowDebugRecorder | None = None):
         """执行所有节点"""
-        node_index_map = {step.get('id'): idx for idx, step in enumerate(self.workflow_steps)}
-        current_index = self._find_start_index()
+        node_index_map = self._node_index_map
+        current_index = self._start_index
         if current_index is None:
             log_error(0, f"工作流 {self.name} 缺少 start 节点", "WORKFLOW_START_NODE_MISSING")
             return
-        visited_nodes = set()
+        # 已访问节点位图：第 i 位表示索引为 i 的节点已执行
+        visited_nodes = 0
         loop_stack = []
 
         while current_index < len(self.workflow_steps):
             step_config = self.workflow_steps[current_index]
-            node_type = step_config.get('type')
-            node_id = step_config.get('id', f"step_{node_type}")
+            node_type = self._node_types[current_index]
+            node_id = self._node_ids[current_index]
 
             # 检测循环跳转，防止死循环
-            if node_id in visited_nodes:
+            node_bit = 1 << current_index
+            if visited_nodes & node_bit:
                 log_error(0, f"工作流 {self.name} 检测到循环跳转: {node_id}", "WORKFLOW_LOOP_DETECTED")
                 break
-            visited_nodes.add(node_id)
+            visited_nodes |= node_bit
 
             try:
                 # 检查是否需要在此节点后停止
                 stop_after_this = context.get_variable('_stop_after_next', False)
                     
                 # 执行单个节点
-                node_start = time.time()
-                result, should_break = await self._execute_node(step_config, context)
-                node_duration = int((time.time() - node_start) * 1000)
+                node_start = perf_counter_ns()
+                result, should_break = await self._execute_node(current_index, context)
+                node_duration = (perf_counter_ns() - node_start) // 1_000_000
                 
                 # 处理 stop_after_this 标记
                 if stop_after_this:
                     context.set_variable('_stop_after_next', False)  # 清除标记
                     if loop_stack:
                         # 返回 foreach 进行下一次迭代
-                        return_index = self._handle_loop_return(node_id, current_index, loop_stack, visited_nodes)
+                        return_index, visited_nodes = self._handle_loop_return(
+                            node_id, current_index, loop_stack, visited_nodes
+                        )
                         if return_index is not None:
                             current_index = return_index
                             continue
@@ -145,7 +171,7 @@ class WorkflowEngine:
                         status="success",
                         output=result,
                         duration_ms=node_duration,
-                        input_data=context.get_all_variables()
+                        input_data=context.variables
                     )
 
                 # 处理 should_break：
@@ -154,18 +180,17 @@ class WorkflowEngine:
                 if should_break:
                     if loop_stack:
                         # 强制返回 foreach，不判断
-                        loop_info = loop_stack.pop()
-                        visited_nodes.discard(loop_info['foreach_id'])
-                        for idx in range(loop_info['loop_body_index'], current_index + 1):
-                            if idx < len(self.workflow_steps):
-                                visited_nodes.discard(self.workflow_steps[idx].get('id'))
-                        current_index = loop_info['foreach_index']
+                        current_index, visited_nodes = self._return_to_foreach(
+                            loop_stack, visited_nodes, current_index
+                        )
                         continue
                     break
 
                 # 处理 foreach 循环控制
                 if isinstance(result, dict) and result.get('loop'):
-                    jump_index = self._handle_loop_start(result, node_id, current_index, node_index_map, loop_stack, visited_nodes)
+                    jump_index, visited_nodes = self._handle_loop_start(
+                        result, node_id, current_index, node_index_map, loop_stack, visited_nodes
+                    )
                     if jump_index is not None:
                         current_index = jump_index
                         if result.get('delay', 0) > 0:
@@ -185,12 +210,12 @@ class WorkflowEngine:
                         if result.get('stop_sequence'):
                             # 执行跳转目标节点
                             await self._execute_and_record_node(
-                                self.workflow_steps[current_index], context, debug_recorder
+                                current_index, context, debug_recorder
                             )
                             
                             # 在循环中返回 foreach，否则停止执行
                             if loop_stack:
-                                current_index = self._return_to_foreach(
+                                current_index, visited_nodes = self._return_to_foreach(
                                     loop_stack, visited_nodes, current_index
                                 )
                                 continue
@@ -207,7 +232,9 @@ class WorkflowEngine:
                 elif isinstance(result, dict) and result.get('stop_sequence'):
                     # 如果在循环中，直接返回到 foreach 节点进行下一次迭代
                     if loop_stack:
-                        return_index = self._handle_loop_return(node_id, current_index, loop_stack, visited_nodes)
+                        return_index, visited_nodes = self._handle_loop_return(
+                            node_id, current_index, loop_stack, visited_nodes
+                        )
                         if return_index is not None:
                             current_index = return_index
                             continue
@@ -218,17 +245,19 @@ class WorkflowEngine:
                 # 检测是否到达循环体末尾
                 if loop_stack and not jumped:
                     if self._should_return_to_loop(current_index, visited_nodes):
-                        return_index = self._handle_loop_return(node_id, current_index, loop_stack, visited_nodes)
+                        return_index, visited_nodes = self._handle_loop_return(
+                            node_id, current_index, loop_stack, visited_nodes
+                        )
                         if return_index is not None:
                             current_index = return_index
                             continue
 
                 # 没有后续节点时流程结束。
                 if loop_stack:
-                    return_index = self._return_to_foreach(loop_stack, visited_nodes, current_index)
-                    if return_index is not None:
-                        current_index = return_index
-                        continue
+                    current_index, visited_nodes = self._return_to_foreach(
+                        loop_stack, visited_nodes, current_index
+                    )
+                    continue
                 break
 
             except Exception as e:
@@ -241,67 +270,68 @@ class WorkflowEngine:
                         node_type=node_type,
                         status="error",
                         error=str(e),
-                        input_data=context.get_all_variables()
+                        input_data=context.variables
                     )
                 if step_config.get('on_fail'):
                     self._handle_error(step_config['on_fail'], context, e)
                 # 纯连线模式下，异常后不按数组继续，避免执行路径失真
                 break
 
-    async def _execute_node(self, step_config: dict, context: WorkflowContext) -> tuple[Any, bool]:
-        """执行单个节点，返回 (result, should_break)"""
-        node_type = step_config.get('type')
-        node_id = step_config.get('id', f"step_{node_type}")
-
-        node_class = NodeRegistry.get_node(node_type)
-        if not node_class:
-            log_error(0, f"未知的节点类型: {node_type}", "WORKFLOW_UNKNOWN_NODE")
-            return None, False
-
-        node = node_class(step_config.get('config', {}))
+    async def _execute_node(self, index: int, context: WorkflowContext) -> tuple[Any, bool]:
+        """执行指定索引的节点，返回 (result, should_break)"""
+        node = self._node_instances[index]
+        if node is None:
+            node_class = self._node_classes[index]
+            if not node_class:
+                log_error(0, f"未知的节点类型: {self._node_types[index]}", "WORKFLOW_UNKNOWN_NODE")
+                return None, False
+            node = node_class(self._node_configs[index])
         result = await node.execute(context)
 
-        if node.should_break(result):
+        break_check = self._break_checks[index]
+        if break_check is not None and break_check(node, result):
             return result, True
 
         return result, False
     
     async def _execute_and_record_node(
             self,
-            step_config: dict,
+            index: int,
             context: WorkflowContext,
             debug_recorder: WorkflowDebugRecorder | None = None
     ) -> Any:
-        """执行并记录节点"""
-        node_start = time.time()
-        result, _ = await self._execute_node(step_config, context)
-        node_duration = int((time.time() - node_start) * 1000)
+        """执行并记录指定索引的节点"""
+        node_start = perf_counter_ns()
+        result, _ = await self._execute_node(index, context)
+        node_duration = (perf_counter_ns() - node_start) // 1_000_000
         
         # 记录节点执行结果
         if debug_recorder:
             debug_recorder.record_node(
-                node_id=step_config.get('id'),
-                node_type=step_config.get('type'),
+                node_id=self.workflow_steps[index].get('id'),
+                node_type=self._node_types[index],
                 status="success",
                 output=result,
                 duration_ms=node_duration,
-                input_data=context.get_all_variables()
+                input_data=context.variables
             )
         return result
     
-    def _return_to_foreach(self, loop_stack: list, visited_nodes: set, current_index: int) -> int:
-        """返回到 foreach 节点进行下一次迭代"""
+    @staticmethod
+    def _loop_reset_mask(loop_info: dict, current_index: int) -> int:
+        """返回 foreach 时需清除的访问位：foreach 节点及循环体起点到当前节点"""
+        body_start = loop_info['loop_body_index']
+        body_mask = ((1 << (current_index + 1)) - 1) & ~((1 << body_start) - 1)
+        return body_mask | (1 << loop_info['foreach_index'])
+
+    def _return_to_foreach(self, loop_stack: list, visited_nodes: int, current_index: int) -> tuple[int, int]:
+        """返回到 foreach 节点进行下一次迭代，返回 (foreach 索引, 清理后的访问位图)"""
         loop_info = loop_stack.pop()
-        visited_nodes.discard(loop_info['foreach_id'])
-        
-        # 清理循环体内节点的访问记录
-        for idx in range(loop_info['loop_body_index'], current_index + 1):
-            if idx < len(self.workflow_steps):
-                visited_nodes.discard(self.workflow_steps[idx].get('id'))
-        
-        return loop_info['foreach_index']
+        # 清理 foreach 及循环体内节点的访问记录
+        visited_nodes &= ~self._loop_reset_mask(loop_info, current_index)
+        return loop_info['foreach_index'], visited_nodes
     
-    def _should_return_to_loop(self, current_index: int, visited_nodes: set) -> bool:
+    def _should_return_to_loop(self, current_index: int, visited_nodes: int) -> bool:
         """判断是否应该返回到循环节点"""
         next_index = current_index + 1
         
@@ -310,33 +340,30 @@ class WorkflowEngine:
             return True
         
         # 检查下一个节点是否已访问过
-        next_node = self.workflow_steps[next_index]
-        next_id = next_node.get('id')
-        
-        return next_id in visited_nodes
+        return bool(visited_nodes >> next_index & 1)
 
     def _handle_loop_start(self, result: dict, node_id: str, current_index: int,
-                           node_index_map: dict, loop_stack: list, visited_nodes: set) -> int | None:
-        """处理循环开始，将循环信息压栈并跳转到循环体"""
+                           node_index_map: dict, loop_stack: list, visited_nodes: int) -> tuple[int | None, int]:
+        """处理循环开始，将循环信息压栈并跳转到循环体，返回 (跳转索引, 访问位图)"""
         loop_body = result.get('loop_body')
         
         if not loop_body or loop_body not in node_index_map:
             log_error(0, f"foreach 循环体节点不存在: {loop_body}", "FOREACH_BODY_NOT_FOUND")
-            return None
+            return None, visited_nodes
 
+        body_index = node_index_map[loop_body]
         # 压入循环信息：foreach_index=返回位置, loop_body_index=循环体起点
         loop_stack.append({
             'foreach_index': current_index,
             'foreach_id': node_id,
-            'loop_body_index': node_index_map[loop_body],
+            'loop_body_index': body_index,
             'loop_end': result.get('loop_end')
         })
-        visited_nodes.discard(loop_body)
-        return node_index_map[loop_body]
+        return body_index, visited_nodes & ~(1 << body_index)
 
     def _handle_loop_return(self, node_id: str, current_index: int,
-                            loop_stack: list, visited_nodes: set) -> int | None:
-        """处理循环返回，判断是否应返回 foreach 进行下一次迭代"""
+                            loop_stack: list, visited_nodes: int) -> tuple[int | None, int]:
+        """处理循环返回，判断是否应返回 foreach 进行下一次迭代，返回 (foreach 索引或 None, 访问位图)"""
         loop_info = loop_stack[-1]
         loop_end_id = loop_info.get('loop_end')
         next_index = current_index + 1
@@ -349,20 +376,14 @@ class WorkflowEngine:
             should_return = (
                 next_index >= len(self.workflow_steps) or
                 next_index <= loop_info['foreach_index'] or
-                (next_index < len(self.workflow_steps) and
-                 self.workflow_steps[next_index].get('id') in visited_nodes)
+                bool(visited_nodes >> next_index & 1)
             )
 
         if not should_return:
-            return None
+            return None, visited_nodes
 
         # 清理循环状态，返回 foreach
-        loop_stack.pop()
-        visited_nodes.discard(loop_info['foreach_id'])
-        for idx in range(loop_info['loop_body_index'], current_index + 1):
-            if idx < len(self.workflow_steps):
-                visited_nodes.discard(self.workflow_steps[idx].get('id'))
-        return loop_info['foreach_index']
+        return self._return_to_foreach(loop_stack, visited_nodes, current_index)
 
     def _check_protocol(self, event) -> bool:
         """
@@ -381,7 +402,7 @@ class WorkflowEngine:
         if not allowed_protocols:
             return True
 
-        current_protocol = event.bot.adapter.get_protocol_name()
+        current_protocol = event._cached_protocol or event.bot.adapter.get_protocol_name()
         return current_protocol in allowed_protocols
 
     def _handle_error(self, error_config: dict[str, Any], context: WorkflowContext, error: Exception):
@@ -1,23 +1,35 @@
 """
 全局变量管理器
 
-从数据库加载全局变量并缓存到 Redis，供工作流使用
+从数据库加载全局变量并缓存到 Redis（哈希，每个变量一个字段），供工作流使用
 """
-import json
+import threading
+import time
 from typing import Any
 
 from Core.logging.file_logger import log_info, log_error
+from Database.Redis.client import hash_get_all, hash_update
 from Database.Redis.keys import workflow_globals_key
+from Models import db, GlobalVariable
 
 # Redis key
 GLOBALS_CACHE_KEY = workflow_globals_key()
 
+# get 未命中哨兵值
+_MISSING = object()
+
+# 全量加载后的有效期（秒）：期内内存未命中视为变量不存在，不再访问 Redis
+GLOBALS_REFRESH_TTL = 60
+
 
 class GlobalVariableManager:
     """全局变量管理器"""
 
     _instance = None
     _cache = {}  # 内存缓存
+    _snapshot = None  # 只读快照（供模板渲染共享），缓存变更时置空重建
+    _loaded_at = 0.0  # 最近一次全量加载时间（monotonic）
+    _refresh_lock = threading.Lock()
 
     def __new__(cls):
         if cls._instance is None:
@@ -27,14 +39,13 @@ class GlobalVariableManager:
     def load(self):
         """从数据库加载全局变量到缓存"""
         try:
-            from Models import GlobalVariable
-            from Database.Redis.client import set_value
-
             variables = GlobalVariable.query.all()
             self._cache = {var.key: var.value for var in variables}
+            self._snapshot = None
+            self._loaded_at = time.monotonic()
 
-            # 同步到 Redis
-            set_value(GLOBALS_CACHE_KEY, json.dumps(self._cache, ensure_ascii=False))
+            # 全量同步到 Redis
+            self._sync_redis(self._cache, replace=True)
 
             log_info(0, f"加载全局变量: {len(self._cache)} 个", "GLOBALS_LOAD")
             return len(self._cache)
@@ -49,92 +60,147 @@ class GlobalVariableManager:
 
     def get(self, key: str, default: Any = None) -> Any:
         """获取全局变量值"""
-        # 优先从内存缓存读取
-        if key in self._cache:
-            return self._cache[key]
+        # 优先从内存缓存读取（单次字典查找）
+        value = self._cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        # 内存没有且缓存已过期时，从 Redis 全量刷新一次
+        if time.monotonic() - self._loaded_at >= GLOBALS_REFRESH_TTL:
+            self._refresh_from_redis()
+        return self._cache.get(key, default)
+
+    def _refresh_from_redis(self):
+        """从 Redis 全量刷新内存缓存；并发未命中时只有一个调用方访问 Redis，其余等待后直接复用结果"""
+        loaded_at = self._loaded_at
+        with self._refresh_lock:
+            # 等锁期间已被其他调用方刷新
+            if self._loaded_at != loaded_at:
+                return
+            try:
+                # 仅在真正读到 Redis 时替换（即使为空，其他进程可能已删除全部变量）；Redis 不可用时保留现有缓存
+                cached = hash_get_all(GLOBALS_CACHE_KEY, fallback=False)
+                if cached is not None:
+                    self._cache = cached
+                    self._snapshot = None
+            except Exception:
+                pass
+            self._loaded_at = time.monotonic()
 
-        # 内存没有则尝试从 Redis 读取
-        try:
-            from Database.Redis.client import get_value
-            cached = get_value(GLOBALS_CACHE_KEY)
-            if cached:
-                if isinstance(cached, bytes):
-                    cached = cached.decode('utf-8')
-                self._cache = json.loads(cached)
-                return self._cache.get(key, default)
-        except Exception:
-            pass
-
-        return default
+    def _ensure_loaded(self):
+        """如果内存缓存为空（且缓存已过期），尝试从 Redis 加载"""
+        if not self._cache and time.monotonic() - self._loaded_at >= GLOBALS_REFRESH_TTL:
+            self._refresh_from_redis()
 
     def get_all(self) -> dict:
         """获取所有全局变量"""
-        # 如果内存缓存为空，尝试从 Redis 加载
-        if not self._cache:
-            try:
-                from Database.Redis.client import get_value
-                cached = get_value(GLOBALS_CACHE_KEY)
-                if cached:
-                    if isinstance(cached, bytes):
-                        cached = cached.decode('utf-8')
-                    self._cache = json.loads(cached)
-            except Exception:
-                pass
+        self._ensure_loaded()
         return self._cache.copy()
 
+    def get_snapshot(self) -> dict:
+        """
+        获取全局变量只读快照（模板渲染用）
+
+        快照在变量变更前一直复用，避免每次渲染复制整个字典；调用方不得修改返回值
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            self._ensure_loaded()
+            snapshot = self._snapshot = self._cache.copy()
+        return snapshot
+
     def set(self, key: str, value: str, description: str = None, is_secret: bool = False):
         """设置全局变量（同时更新数据库和缓存）"""
+        return self.set_many([(key, value, description, is_secret)])
+
+    def delete(self, key: str):
+        """删除全局变量"""
+        return self.delete_many([key])
+
+    def set_many(self, items: list[tuple], delete_keys: list[str] = None) -> bool:
+        """
+        批量设置全局变量：一次数据库提交 + 一次 Redis 写入
+        
+        Args:
+            items: [(key, value, description, is_secret), ...]
+            delete_keys: 同时删除的变量名（如变量改名时的旧名）
+        """
         try:
-            from Models import db, GlobalVariable
-            from Database.Redis.client import set_value
+            keys = [item[0] for item in items]
+            if delete_keys:
+                keys.extend(delete_keys)
+            existing = {
+                var.key: var for var in GlobalVariable.query.filter(GlobalVariable.key.in_(keys)).all()
+            } if keys else {}
 
             # 更新数据库
-            var = GlobalVariable.query.filter_by(key=key).first()
-            if var:
-                var.value = value
-                if description is not None:
-                    var.description = description
-                var.is_secret = is_secret
-            else:
-                db.session.add(GlobalVariable(
-                    key=key,
-                    value=value,
-                    description=description,
-                    is_secret=is_secret
-                ))
+            for key in delete_keys or ():
+                var = existing.pop(key, None)
+                if var:
+                    db.session.delete(var)
+            if delete_keys:
+                # 先删除再写入，避免改名时新旧 key 冲突
+                db.session.flush()
+            for key, value, description, is_secret in items:
+                var = existing.get(key)
+                if var:
+                    var.value = value
+                    if description is not None:
+                        var.description = description
+                    var.is_secret = is_secret
+                else:
+                    var = existing[key] = GlobalVariable(
+                        key=key,
+                        value=value,
+                        description=description,
+                        is_secret=is_secret
+                    )
+                    db.session.add(var)
             db.session.commit()
 
             # 更新缓存
-            self._cache[key] = value
-            set_value(GLOBALS_CACHE_KEY, json.dumps(self._cache, ensure_ascii=False))
+            for key in delete_keys or ():
+                self._cache.pop(key, None)
+            for key, value, _, _ in items:
+                self._cache[key] = value
+            self._snapshot = None
+            self._sync_redis({key: value for key, value, _, _ in items}, delete_keys)
             return True
 
         except Exception as e:
-            log_error(0, f"设置全局变量失败: {e}", "GLOBALS_SET_ERROR", key=key, error=str(e))
+            log_error(0, f"设置全局变量失败: {e}", "GLOBALS_SET_ERROR",
+                      keys=[item[0] for item in items], error=str(e))
             return False
 
-    def delete(self, key: str):
-        """删除全局变量"""
+    def delete_many(self, keys: list[str]) -> bool:
+        """批量删除全局变量：一次数据库提交 + 一次 Redis 写入"""
         try:
-            from Models import db, GlobalVariable
-            from Database.Redis.client import set_value
-
             # 从数据库删除
-            var = GlobalVariable.query.filter_by(key=key).first()
-            if var:
-                db.session.delete(var)
+            if keys:
+                GlobalVariable.query.filter(GlobalVariable.key.in_(keys)).delete(synchronize_session=False)
                 db.session.commit()
 
             # 更新缓存
-            if key in self._cache:
-                del self._cache[key]
-            set_value(GLOBALS_CACHE_KEY, json.dumps(self._cache, ensure_ascii=False))
+            for key in keys:
+                self._cache.pop(key, None)
+            self._snapshot = None
+            self._sync_redis(delete_keys=keys)
             return True
 
         except Exception as e:
-            log_error(0, f"删除全局变量失败: {e}", "GLOBALS_DELETE_ERROR", key=key, error=str(e))
+            log_error(0, f"删除全局变量失败: {e}", "GLOBALS_DELETE_ERROR", keys=list(keys), error=str(e))
             return False
 
+    @staticmethod
+    def _sync_redis(values: dict = None, delete_keys=None, replace: bool = False):
+        """将变更的字段同步到 Redis 哈希（单次 pipeline），replace=True 时全量重建"""
+        hash_update(
+            GLOBALS_CACHE_KEY,
+            {key: '' if value is None else value for key, value in (values or {}).items()},
+            delete_fields=delete_keys,
+            replace=replace
+        )
+
 
 # 单例实例
 global_variables = GlobalVariableManager()
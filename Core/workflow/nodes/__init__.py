@@ -5,6 +5,7 @@
 """
 import importlib
 import re
+from functools import lru_cache
 from pathlib import Path
 
 from Core.logging.file_logger import log_error
@@ -12,14 +13,23 @@ from .base import BaseNode
 from ..registry import NodeRegistry
 
 
+# 驼峰边界（非开头的大写字母前）
+_CAMEL_BOUNDARY_RE = re.compile(r'(?<!^)(?=[A-Z])')
+
+
+@lru_cache(maxsize=None)
 def _camel_to_snake(name: str) -> str:
     """将驼峰命名转换为下划线命名：SendMessageNode -> send_message"""
     if name.endswith('Node'):
         name = name[:-4]
-    return re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower()
+    return _CAMEL_BOUNDARY_RE.sub('_', name).lower()
+
 
+# 是否已完成注册（重复调用时跳过目录扫描与模块导入）
+_registered = False
 
-def auto_register_nodes():
+
+def auto_register_nodes(force: bool = False):
     """
     自动扫描 nodes 目录下的所有 .py 文件，注册 BaseNode 子类
     
@@ -27,7 +37,15 @@ def auto_register_nodes():
     - 跳过 base.py 和 __init__.py
     - 类名自动转换为 node_type：SendMessageNode -> send_message
     - 如果节点定义了 node_type 属性，优先使用
+    
+    Args:
+        force: 已注册过时是否仍重新扫描
     """
+    global _registered
+    if _registered and not force:
+        return
+    _registered = True
+
     nodes_dir = Path(__file__).parent
 
     for file_path in nodes_dir.glob('*.py'):
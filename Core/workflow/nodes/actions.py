@@ -9,6 +9,11 @@ from Core.message.builder import MessageBuilder
 from .base import BaseNode
 
 
+def _build_text(node, content, context, event):
+    """构建文本消息（也用于未知消息类型）"""
+    return MessageBuilder.text(content, event=event)
+
+
 class SendMessageNode(BaseNode):
     """发送消息节点 - 支持协议选择"""
 
@@ -107,19 +112,60 @@ class SendMessageNode(BaseNode):
         }
     ]
 
+    def _build_markdown(self, content, context, event):
+        """构建 Markdown 消息（可附带按钮）"""
+        template_id = self.config['markdown_template_id'].strip()
+        keyboard_id = self.config['keyboard_id'].strip()
+        keyboard_content = context.render_template(self.config['keyboard_content']).strip()
+        if keyboard_content:
+            try:
+                parsed = json.loads(keyboard_content)
+                if not isinstance(parsed, dict):
+                    raise ValueError("keyboard_content 必须是 JSON 对象")
+                if not (
+                    isinstance(parsed.get('rows'), list) or
+                    ('text' in parsed and 'link' in parsed)
+                ):
+                    raise ValueError("keyboard_content 需为官方 keyboard.content（含 rows）或简写格式（含 text/link）")
+            except Exception as e:
+                raise ValueError(f"自定义按钮JSON格式错误: {e}")
+        return MessageBuilder.markdown(
+            content,
+            template_id=template_id,
+            keyboard_id=keyboard_id,
+            keyboard_content=keyboard_content,
+            event=event
+        )
+
+    def _build_ark(self, content, context, event):
+        """构建 ARK 模板消息"""
+        ark_template_id = int(self.config['ark_template_id'])
+        return MessageBuilder.ark(content, template_id=ark_template_id, event=event)
+
+    # 消息类型 -> 构建函数(node, content, context, event)，未知类型按文本发送
+    _BUILDERS = {
+        'text': _build_text,
+        'image': lambda node, content, context, event: MessageBuilder.image(content, event=event),
+        'video': lambda node, content, context, event: MessageBuilder.video(content, event=event),
+        'voice': lambda node, content, context, event: MessageBuilder.voice(content, event=event),
+        'file': lambda node, content, context, event: MessageBuilder.file(content, event=event),
+        'markdown': _build_markdown,
+        'ark': _build_ark,
+    }
+
     async def _execute(self, context):
         """执行发送消息"""
         msg_type = self.config['message_type']
         adapter = context.event.bot.adapter
-        protocol = adapter.get_protocol_name()
 
         # 1. 检查协议是否支持
         if not adapter.supports_message_type(msg_type):
-            if self.config.get('skip_if_unsupported', False):
+            if self.config['skip_if_unsupported']:
                 # 跳过此步骤
                 return None
             else:
                 # 抛出错误
+                protocol = context.event._cached_protocol or adapter.get_protocol_name()
                 raise ValueError(
                     f"当前协议 '{protocol}' 不支持消息类型 '{msg_type}'"
                 )
@@ -127,55 +173,17 @@ class SendMessageNode(BaseNode):
         # 2. 渲染内容
         content = context.render_template(self.config['content'])
 
-        # 3. 根据类型构建消息 (使用 match-case, Python 3.10+)
-        event = context.event
+        # 3. 根据类型构建消息（按类型分发到构建函数）
         try:
-            match msg_type:
-                case 'text':
-                    message = MessageBuilder.text(content, event=event)
-                case 'image':
-                    message = MessageBuilder.image(content, event=event)
-                case 'video':
-                    message = MessageBuilder.video(content, event=event)
-                case 'voice':
-                    message = MessageBuilder.voice(content, event=event)
-                case 'file':
-                    message = MessageBuilder.file(content, event=event)
-                case 'markdown':
-                    template_id = self.config.get('markdown_template_id', '').strip()
-                    keyboard_id = self.config.get('keyboard_id', '').strip()
-                    keyboard_content = context.render_template(self.config.get('keyboard_content', '')).strip()
-                    if keyboard_content:
-                        try:
-                            parsed = json.loads(keyboard_content)
-                            if not isinstance(parsed, dict):
-                                raise ValueError("keyboard_content 必须是 JSON 对象")
-                            if not (
-                                isinstance(parsed.get('rows'), list) or
-                                ('text' in parsed and 'link' in parsed)
-                            ):
-                                raise ValueError("keyboard_content 需为官方 keyboard.content（含 rows）或简写格式（含 text/link）")
-                        except Exception as e:
-                            raise ValueError(f"自定义按钮JSON格式错误: {e}")
-                    message = MessageBuilder.markdown(
-                        content,
-                        template_id=template_id,
-                        keyboard_id=keyboard_id,
-                        keyboard_content=keyboard_content,
-                        event=event
-                    )
-                case 'ark':
-                    ark_template_id = int(self.config.get('ark_template_id', '24'))
-                    message = MessageBuilder.ark(content, template_id=ark_template_id, event=event)
-                case _:
-                    message = MessageBuilder.text(content, event=event)
+            build = self._BUILDERS.get(msg_type, _build_text)
+            message = build(self, content, context, context.event)
 
             # 4. 设置响应；没有后续节点时由引擎结束流程。
             context._response = message
 
             # 5. 处理跳转
             result = {'success': True}
-            if self.config.get('next_node'):
+            if self.config['next_node']:
                 result['next_node'] = self.config['next_node']
 
             return result
@@ -3,8 +3,18 @@
 
 所有节点类型的基础抽象类
 """
+import asyncio
+import os
 from abc import ABC, abstractmethod
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+# 节点阻塞/CPU 密集操作共享的线程池，避免占用消息事件循环
+_NODE_EXECUTOR = ThreadPoolExecutor(
+    max_workers=min(32, (os.cpu_count() or 1) * 2),
+    thread_name_prefix="workflow_node"
+)
 
 
 class BaseNode(ABC):
@@ -16,6 +26,9 @@ class BaseNode(ABC):
     category = "other"  # trigger, condition, action, data
     icon = "📦"
 
+    # 节点是否无状态（执行时不在实例上保存数据），无状态节点由引擎创建一次后复用
+    STATELESS = True
+
     # 配置项定义（用于前端生成表单）
     config_schema = []
 
@@ -35,6 +48,30 @@ class BaseNode(ABC):
     ]
     """
 
+    # 由 outputs / inputs 预先计算（类级常量，见 __init_subclass__）
+    _output_names: frozenset[str] = frozenset()
+    _required_inputs: tuple[tuple[str, str], ...] = ()
+    _config_defaults: dict[str, Any] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        """子类定义时冻结元信息列表，并预先计算输出变量名集合与必需输入，避免每次执行重复构建"""
+        super().__init_subclass__(**kwargs)
+        # 元信息列表转为元组（@property 形式的动态 config_schema 保持不变）
+        for attr in ('config_schema', 'inputs', 'outputs'):
+            value = cls.__dict__.get(attr)
+            if isinstance(value, list):
+                setattr(cls, attr, tuple(value))
+        cls._output_names = frozenset(out['name'] for out in cls.outputs)
+        # 配置项默认值（仅声明了 default 的字段；@property 形式的 config_schema 不参与）
+        schema = getattr(cls, 'config_schema', ())
+        cls._config_defaults = {
+            field['name']: field['default'] for field in schema if 'default' in field
+        } if isinstance(schema, (list, tuple)) else {}
+        cls._required_inputs = tuple(
+            (input_def['name'], input_def.get('label', input_def['name']))
+            for input_def in cls.inputs if input_def.get('required', False)
+        )
+
     def __init__(self, config: dict[str, Any]):
         """
         初始化节点
@@ -42,7 +79,9 @@ class BaseNode(ABC):
         Args:
             config: 节点配置字典
         """
-        self.config = config
+        # 合并配置项默认值（新建字典，不修改工作流原始配置），执行时可直接下标读取
+        defaults = self._config_defaults
+        self.config = {**defaults, **config} if defaults else config
 
     async def execute(self, context) -> Any:
         """
@@ -85,6 +124,22 @@ class BaseNode(ABC):
         """
         pass
 
+    @staticmethod
+    async def run_blocking(func: Callable, *args, **kwargs) -> Any:
+        """
+        在共享线程池中执行阻塞函数，执行期间事件循环可继续处理其他事件
+        
+        Args:
+            func: 同步函数
+            *args: 位置参数
+            **kwargs: 关键字参数
+            
+        Returns:
+            函数返回值
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_NODE_EXECUTOR, partial(func, *args, **kwargs))
+
     def _auto_save_outputs(self, context, result: Any):
         """
         自动保存节点输出到 context
@@ -95,12 +150,11 @@ class BaseNode(ABC):
             context: WorkflowContext 执行上下文
             result: 节点执行结果
         """
-        if not isinstance(result, dict):
+        # 未声明输出（如发送消息等动作节点）时直接返回
+        output_names = self._output_names
+        if not output_names or not isinstance(result, dict):
             return
 
-        # 获取声明的输出变量名称
-        output_names = {out['name'] for out in self.outputs}
-
         # 只保存声明的输出变量
         for key, value in result.items():
             if key in output_names and value is not None:
@@ -141,11 +195,9 @@ class BaseNode(ABC):
         Returns:
             (是否有效, 错误信息)
         """
-        for input_def in self.inputs:
-            if input_def.get('required', False):
-                var_name = input_def['name']
-                if var_name not in context.variables:
-                    return False, f"缺少必需输入变量: {input_def.get('label', var_name)}"
+        for var_name, label in self._required_inputs:
+            if var_name not in context.variables:
+                return False, f"缺少必需输入变量: {label}"
         return True, ""
 
     def get_available_outputs(self) -> list[str]:
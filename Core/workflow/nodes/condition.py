@@ -1,11 +1,39 @@
 """
 条件判断节点
 """
-from typing import Any
+import re
+from functools import lru_cache
+from operator import contains, eq, ne
+from typing import Any, Callable
 
 from .base import BaseNode
 
 
+@lru_cache(maxsize=1024)
+def _compile_regex(pattern: str) -> re.Pattern:
+    """编译正则并缓存，避免超出 re 模块内部缓存后重复编译"""
+    return re.compile(pattern)
+
+
+# get_variable 未找到变量时的哨兵值
+_MISSING = object()
+
+# 运算符 -> 比较函数(value1, value2)，导入时构建一次；比较中的异常（如数字转换失败、正则错误）统一视为不满足
+_OPERATORS: dict[str, Callable[[str, str], bool]] = {
+    'equals': eq,
+    'not_equals': ne,
+    'contains': contains,
+    'not_contains': lambda value1, value2: value2 not in value1,
+    'starts_with': str.startswith,
+    'ends_with': str.endswith,
+    'greater_than': lambda value1, value2: float(value1) > float(value2),
+    'less_than': lambda value1, value2: float(value1) < float(value2),
+    'is_empty': lambda value1, value2: not value1.strip(),
+    'is_not_empty': lambda value1, value2: bool(value1.strip()),
+    'regex': lambda value1, value2: _compile_regex(value2).search(value1) is not None,
+}
+
+
 class ConditionNode(BaseNode):
     """条件判断节点 - 支持多种比较运算"""
 
@@ -128,7 +156,7 @@ class ConditionNode(BaseNode):
 
     async def _execute(self, context) -> Any:
         """执行条件判断"""
-        mode = self.config.get('mode', 'simple')
+        mode = self.config['mode']
 
         if mode == 'advanced':
             # 高级模式：多条件组合
@@ -144,61 +172,28 @@ class ConditionNode(BaseNode):
         # 获取配置参数
         variable_name = self.config.get('variable_name', '')
         compare_value = self.config.get('compare_value', '')
-        operator = self.config.get('condition_type', 'equals')
-
-        # 从上下文获取变量值
-        value1 = str(context.get_variable(variable_name, ''))
-        # 比较值支持模板渲染
-        value2 = context.render_template(str(compare_value))
+        operator = self.config['condition_type']
+
+        # 从上下文获取变量值（已是字符串时不再转换）
+        value1 = context.get_variable(variable_name, '')
+        if not isinstance(value1, str):
+            value1 = str(value1)
+        # 比较值支持模板渲染（render_template 对非字符串自行转换）
+        value2 = context.render_template(compare_value)
         
         # 执行判断
-        result = False
-
-        # 根据运算符执行比较
-        match operator:
-            case 'equals':
-                result = value1 == value2
-            case 'not_equals':
-                result = value1 != value2
-            case 'contains':
-                result = value2 in value1
-            case 'not_contains':
-                result = value2 not in value1
-            case 'starts_with':
-                result = value1.startswith(value2)
-            case 'ends_with':
-                result = value1.endswith(value2)
-            case 'greater_than':
-                try:
-                    result = float(value1) > float(value2)
-                except ValueError:
-                    result = False
-            case 'less_than':
-                try:
-                    result = float(value1) < float(value2)
-                except ValueError:
-                    result = False
-            case 'is_empty':
-                result = not value1 or value1.strip() == ''
-            case 'is_not_empty':
-                result = bool(value1 and value1.strip())
-            case 'regex':
-                import re
-                try:
-                    result = bool(re.search(value2, value1))
-                except re.error:
-                    result = False
+        result = self._evaluate_single_condition(value1, operator, value2)
 
         # 保存结果到上下文
         context.set_variable('result', result)
 
         # 确定跳转目标
         if result:
-            next_node = self.config.get('true_branch')
+            next_node = self.config['true_branch']
         else:
-            next_node = self.config.get('false_branch')
+            next_node = self.config['false_branch']
         
-        stop_after = self.config.get('stop_after_branch', False)
+        stop_after = self.config['stop_after_branch']
 
         return {
             'success': True,
@@ -207,101 +202,76 @@ class ConditionNode(BaseNode):
             'stop_sequence': stop_after
         }
 
+    def _get_parsed_conditions(self) -> tuple[tuple[str, str, str], ...]:
+        """解析条件列表（配置在节点生命周期内不变，首次解析后缓存）"""
+        conditions = getattr(self, '_parsed_conditions', None)
+        if conditions is None:
+            conditions = self._parsed_conditions = self._parse_conditions(self.config['conditions'])
+        return conditions
+
+    @staticmethod
+    def _parse_conditions(conditions_text: str) -> tuple[tuple[str, str, str], ...]:
+        """将条件文本解析为 (变量名, 运算符, 比较值) 元组，跳过空行、注释（#）与格式不正确的行"""
+        return tuple(
+            (parts[0].strip(), parts[1].strip(), parts[2].strip() if len(parts) > 2 else '')
+            for raw_line in conditions_text.splitlines()
+            if (line := raw_line.strip()) and not line.startswith('#')
+            and len(parts := line.split('|', 2)) >= 2
+        )
+
     def _execute_advanced(self, context) -> Any:
         """高级模式：多条件组合判断"""
-        logic_type = self.config.get('logic_type', 'AND')
-        conditions_text = self.config.get('conditions', '').strip()
-
-        if not conditions_text:
-            # 没有条件，默认返回True
-            return self._build_result(context, True)
-
-        # 解析条件
-        conditions = []
-        for line in conditions_text.split('\n'):
-            line = line.strip()
-            if not line or line.startswith('#'):  # 跳过空行和注释
-                continue
-
-            parts = line.split('|')
-            if len(parts) < 2:
-                continue  # 格式不正确，跳过
-
-            variable_name = parts[0].strip()
-            operator = parts[1].strip()
-            compare_value = parts[2].strip() if len(parts) > 2 else ''
-
-            conditions.append({
-                'variable': variable_name,
-                'operator': operator,
-                'value': compare_value
-            })
+        logic_type = self.config['logic_type']
+        conditions = self._get_parsed_conditions()
 
         if not conditions:
-            # 解析后没有有效条件
+            # 没有条件（或解析后没有有效条件），默认返回True
             return self._build_result(context, True)
 
-        # 执行条件判断
-        results = []
-        for cond in conditions:
-            variable_name = cond['variable']
-            operator = cond['operator']
-            compare_value = cond['value']
-
-            # 从上下文获取变量值，统一使用模板语法
-            value1 = str(context.render_template(variable_name))
-            # 比较值支持模板渲染
-            value2 = context.render_template(str(compare_value))
+        # 执行条件判断：同一文本在本次执行内只解析一次；AND 遇假、OR 遇真即停止
+        # 左右两侧解析规则不同（左侧纯变量名按变量取值，右侧按模板渲染），分开缓存
+        is_and = logic_type == 'AND'
+        final_result = is_and
+        operands = {}
+        compare_values = {}
+        for variable_name, operator, compare_value in conditions:
+            # 变量名为纯变量名（不含模板语法）时直接取值，否则按模板渲染；比较值支持模板渲染
+            value1 = operands.get(variable_name)
+            if value1 is None:
+                value1 = operands[variable_name] = self._resolve_operand(context, variable_name)
+            value2 = compare_values.get(compare_value)
+            if value2 is None:
+                value2 = compare_values[compare_value] = context.render_template(compare_value)
 
             # 执行单个条件判断
-            result = self._evaluate_single_condition(value1, operator, value2)
-            results.append(result)
-
-        # 根据逻辑类型组合结果
-        if logic_type == 'AND':
-            final_result = all(results)
-        else:  # OR
-            final_result = any(results)
+            if self._evaluate_single_condition(value1, operator, value2) != is_and:
+                final_result = not is_and
+                break
 
         return self._build_result(context, final_result)
 
-    def _evaluate_single_condition(self, value1: str, operator: str, value2: str) -> bool:
-        """评估单个条件（用于高级模式）"""
+    @staticmethod
+    def _resolve_operand(context, variable_name: str) -> str:
+        """
+        获取高级模式条件左侧的值
+        
+        不含模板语法时按变量名（支持点号）直接从上下文取值，省去模板渲染；
+        变量不存在时保持原有行为，按字面文本处理
+        """
+        if '{' not in variable_name:
+            value = context.get_variable(variable_name, _MISSING)
+            if value is not _MISSING:
+                return value if isinstance(value, str) else str(value)
+        return context.render_template(variable_name)
+
+    @staticmethod
+    def _evaluate_single_condition(value1: str, operator: str, value2: str) -> bool:
+        """评估单个条件（简单模式与高级模式共用）"""
+        compare = _OPERATORS.get(operator)
+        if compare is None:
+            return False
         try:
-            if operator == 'equals':
-                return value1 == value2
-            elif operator == 'not_equals':
-                return value1 != value2
-            elif operator == 'contains':
-                return value2 in value1
-            elif operator == 'not_contains':
-                return value2 not in value1
-            elif operator == 'starts_with':
-                return value1.startswith(value2)
-            elif operator == 'ends_with':
-                return value1.endswith(value2)
-            elif operator == 'greater_than':
-                try:
-                    return float(value1) > float(value2)
-                except ValueError:
-                    return False
-            elif operator == 'less_than':
-                try:
-                    return float(value1) < float(value2)
-                except ValueError:
-                    return False
-            elif operator == 'is_empty':
-                return not value1 or value1.strip() == ''
-            elif operator == 'is_not_empty':
-                return bool(value1 and value1.strip())
-            elif operator == 'regex':
-                import re
-                try:
-                    return bool(re.search(value2, value1))
-                except re.error:
-                    return False
-            else:
-                return False
+            return compare(value1, value2)
         except Exception:
             return False
 
@@ -312,9 +282,9 @@ class ConditionNode(BaseNode):
 
         # 确定跳转目标
         if condition_result:
-            next_node = self.config.get('true_branch')
+            next_node = self.config['true_branch']
         else:
-            next_node = self.config.get('false_branch')
+            next_node = self.config['false_branch']
 
         return {
             'success': True,
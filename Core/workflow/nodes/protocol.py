@@ -65,7 +65,8 @@ class ProtocolCheckNode(BaseNode):
     def _execute(self, context):
         """执行协议检查"""
         # 获取当前协议
-        protocol = context.event.bot.adapter.get_protocol_name()
+        event = context.event
+        protocol = event._cached_protocol or event.bot.adapter.get_protocol_name()
 
         # 保存到上下文
         context.set_variable('protocol', protocol)
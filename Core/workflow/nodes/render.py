@@ -168,7 +168,9 @@ class HtmlRenderNode(BaseNode):
 
         # 6. 调用浏览器渲染
         try:
-            image_base64 = browser.render(
+            # 模板渲染与截图等待均为同步阻塞操作，放到线程池执行
+            image_base64 = await self.run_blocking(
+                browser.render,
                 template_path=template_path,
                 data=template_data,
                 width=width,
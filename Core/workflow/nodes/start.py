@@ -119,7 +119,7 @@ class StartNode(BaseNode):
         protocol = "unknown"
         bot_id = ""
         if hasattr(event, 'bot') and hasattr(event.bot, 'adapter'):
-            protocol = event.bot.adapter.get_protocol_name()
+            protocol = event._cached_protocol or event.bot.adapter.get_protocol_name()
             bot_id = getattr(event.bot, 'self_id', '')
 
         # 获取原始消息（包含 CQ 码）
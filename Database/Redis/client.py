@@ -236,6 +236,116 @@ def set_value(key, value, expire_seconds=None):
             }
 
 
+def set_values(mapping: dict, expire_seconds=None):
+    """批量写入键值对（单次 pipeline 往返），支持Redis降级到内存缓存"""
+    global _redis_available
+
+    if not mapping:
+        return
+
+    with _redis_lock:
+        redis_available = _redis_available
+
+    if redis_available or _try_reconnect():
+        try:
+            # 使用with语句确保连接立即释放
+            with get_redis() as client:
+                pipe = client.pipeline(transaction=False)
+                for key, value in mapping.items():
+                    pipe.set(key, value, ex=expire_seconds)
+                pipe.execute()
+            return
+        except Exception:
+            _handle_redis_failure()
+
+    _clean_memory_cache()
+    expire_time = time.time() + (expire_seconds or float('inf'))
+    with _cache_lock:
+        for key, value in mapping.items():
+            _memory_cache[key] = {'value': value, 'expire_time': expire_time}
+
+
+def _decode(value):
+    """bytes 统一解码为 str（decode_responses=False 时）"""
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+def _memory_hash(key) -> dict:
+    """获取内存缓存中的哈希（不存在或已过期时新建），调用方需持有 _cache_lock"""
+    cache_data = _memory_cache.get(key)
+    if not cache_data or cache_data['expire_time'] <= time.time() or not isinstance(cache_data['value'], dict):
+        cache_data = _memory_cache[key] = {'value': {}, 'expire_time': float('inf')}
+    return cache_data['value']
+
+
+def hash_update(key, mapping: dict = None, delete_fields=None, replace=False):
+    """
+    批量更新哈希字段（单次 pipeline 往返），支持Redis降级到内存缓存
+
+    Args:
+        key: 哈希键
+        mapping: 要写入的字段
+        delete_fields: 要删除的字段
+        replace: 是否先清空整个哈希（全量重建）
+    """
+    global _redis_available
+
+    with _redis_lock:
+        redis_available = _redis_available
+
+    if redis_available or _try_reconnect():
+        try:
+            # 使用with语句确保连接立即释放
+            with get_redis() as client:
+                pipe = client.pipeline(transaction=True)
+                if replace:
+                    pipe.delete(key)
+                if mapping:
+                    pipe.hset(key, mapping=mapping)
+                if delete_fields:
+                    pipe.hdel(key, *delete_fields)
+                pipe.execute()
+            return
+        except Exception:
+            _handle_redis_failure()
+
+    with _cache_lock:
+        if replace:
+            _memory_cache.pop(key, None)
+        data = _memory_hash(key)
+        if mapping:
+            data.update(mapping)
+        for field in delete_fields or ():
+            data.pop(field, None)
+
+
+def hash_get_all(key, fallback=True):
+    """
+    读取整个哈希，支持Redis降级到内存缓存
+
+    Args:
+        key: 哈希键
+        fallback: Redis 不可用时是否降级读取内存缓存；为 False 时返回 None，便于调用方区分读取失败与空哈希
+    """
+    global _redis_available
+
+    with _redis_lock:
+        redis_available = _redis_available
+
+    if redis_available or _try_reconnect():
+        try:
+            with get_redis() as client:
+                return {_decode(field): _decode(value) for field, value in client.hgetall(key).items()}
+        except Exception:
+            _handle_redis_failure()
+
+    if not fallback:
+        return None
+
+    with _cache_lock:
+        return dict(_memory_hash(key))
+
+
 def get_value(key):
     """读取键值，支持Redis降级到内存缓存"""
     global _redis_available
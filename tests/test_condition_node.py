@@ -0,0 +1,49 @@
+"""
+条件判断节点测试
+"""
+import asyncio
+import unittest
+
+from Core.workflow.nodes.condition import ConditionNode
+
+
+class _FakeContext:
+    """最小上下文：变量取值 + 模板渲染（不含 '{' 的文本原样返回）"""
+
+    def __init__(self, variables: dict):
+        self.variables = dict(variables)
+
+    def get_variable(self, key, default=None):
+        return self.variables.get(key, default)
+
+    def render_template(self, template_str) -> str:
+        return "" if template_str is None else str(template_str)
+
+    def set_variable(self, key, value):
+        self.variables[key] = value
+
+
+def _run_advanced(conditions: str, variables: dict, logic_type: str = 'AND') -> bool:
+    node = ConditionNode({'mode': 'advanced', 'logic_type': logic_type, 'conditions': conditions})
+    result = asyncio.run(node.execute(_FakeContext(variables)))
+    return result['result']
+
+
+class ConditionNodeAdvancedTest(unittest.TestCase):
+
+    def test_operand_and_compare_value_caches_are_separate(self):
+        """同一文本在左侧按变量取值、在右侧按字面值，结果不随行顺序变化"""
+        variables = {'status': 'ok', 'ok': 'yes'}
+        # 第二行单独判断为假（'yes' != 'ok'），组合后也必须为假
+        self.assertFalse(_run_advanced('ok|equals|ok', variables))
+        self.assertFalse(_run_advanced('status|equals|ok\nok|equals|ok', variables))
+        self.assertFalse(_run_advanced('ok|equals|ok\nstatus|equals|ok', variables))
+
+    def test_bare_compare_value_is_literal(self):
+        """右侧纯文本不会取到左侧缓存的同名变量值"""
+        variables = {'ok': 'yes', 'status': 'ok'}
+        self.assertTrue(_run_advanced('ok|equals|yes\nstatus|equals|ok', variables))
+
+
+if __name__ == '__main__':
+    unittest.main()
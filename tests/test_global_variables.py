@@ -0,0 +1,65 @@
+"""
+全局变量管理器测试
+"""
+import time
+import unittest
+from unittest import mock
+
+from Core.workflow.globals import GlobalVariableManager
+from Database.Redis import client as redis_client
+
+
+class _FakeRedis:
+    """最小 Redis 客户端：只支持 HGETALL"""
+
+    def __init__(self, data: dict):
+        self.data = data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def hgetall(self, key):
+        return {field.encode(): value.encode() for field, value in self.data.items()}
+
+
+class GlobalVariableRefreshTest(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = GlobalVariableManager()
+        self.manager._cache = {'api_key': 'secret', 'greeting': 'hi'}
+        self.manager._snapshot = None
+        # 缓存已过期，下一次未命中会触发全量刷新
+        self.manager._loaded_at = time.monotonic() - 3600
+        self.addCleanup(setattr, redis_client, '_redis_available', redis_client._redis_available)
+        redis_client._redis_available = True
+
+    def test_redis_outage_keeps_existing_cache(self):
+        """Redis 不可用时刷新失败，保留现有缓存而不是换成空的内存降级哈希"""
+        with mock.patch.object(redis_client, 'get_redis', side_effect=RuntimeError('Redis连接池未初始化')), \
+                mock.patch.object(redis_client, '_try_reconnect', return_value=False):
+            self.assertIsNone(self.manager.get('not_defined'))
+
+        self.assertEqual(self.manager.get('api_key'), 'secret')
+        self.assertEqual(self.manager.get_snapshot(), {'api_key': 'secret', 'greeting': 'hi'})
+
+    def test_empty_redis_hash_clears_cache(self):
+        """真正读到 Redis 空哈希时（其他进程已删除全部变量）替换为空"""
+        with mock.patch.object(redis_client, 'get_redis', return_value=_FakeRedis({})):
+            self.assertIsNone(self.manager.get('not_defined'))
+
+        self.assertIsNone(self.manager.get('api_key'))
+        self.assertEqual(self.manager.get_all(), {})
+
+    def test_redis_hash_replaces_cache(self):
+        """读到 Redis 哈希时以其为准"""
+        with mock.patch.object(redis_client, 'get_redis', return_value=_FakeRedis({'greeting': 'hello'})):
+            self.assertIsNone(self.manager.get('not_defined'))
+
+        self.assertEqual(self.manager.get_snapshot(), {'greeting': 'hello'})
+
+
+if __name__ == '__main__':
+    unittest.main()